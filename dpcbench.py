@@ -0,0 +1,218 @@
+# dpcbench.py
+# 실행:
+#   python dpcbench.py gen out.xml [--notes 100000] [--mode 8] [--holds 0.1] [--spread 10] [--seed 0]
+#   python dpcbench.py run [--sizes 1000 10000 100000 1000000] [--mode 8] [--holds 0.1] [--spread 10] [--csv out.csv]
+# 필요: pygame (키 상수만 사용)
+#
+# 핫패스 마이크로 벤치마크. 시드 고정 합성 채보(note_list/track XML)를 크기별로 만들고
+# 각 함수의 호출당 시간과 크기 증가에 따른 지수(≈ O(n^k)의 k)를 출력한다.
+# 프레임/키 입력마다 불리는 함수의 k가 0에서 멀어지면 O(n) 회귀를 의심할 것.
+# 생성 채보는 --mode에서 입력 가능한 트랙만 사용하므로 같은 모드로 dpcvalidate를 통과한다.
+
+import os
+import sys
+import csv
+import math
+import time
+import random
+import argparse
+import tempfile
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from dpcviewer10 import (
+    BTN_THICKNESS_MM, FPS, MARGIN_BOTTOM, MODES, NOTE_SPEED_MM_PER_S, PIXELS_PER_MM, SIM_DT, WINDOW_SIZE,
+    LS_TRACK, RS_TRACK, TL_TRACK, TR_TRACK,
+    JudgeEngine, build_mode_mapping, build_note_index, cull_window, load_notes_from_xml, visible_notes,
+)
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+# spread=N이면 이 순서로 (모드에서 입력 가능한 트랙 중) 앞에서 N개 트랙에 노트 배치
+TRACK_ORDER = (3, 4, 5, 6, 7, 8, LS_TRACK, RS_TRACK, TL_TRACK, TR_TRACK)
+GEN_TPS = 480
+GEN_GAPS = (120, 180, 240, 360, 480)   # 같은 트랙 노트 간격 (tick, 판정 범위보다 넓게)
+GEN_HOLD_DURS = (240, 480, 960)
+BENCH_BUDGET_S = 0.2                   # 벤치 하나당 측정 시간
+BENCH_MAX_OPS = 2000
+SUSPECT_EXPONENT = 0.5                 # 상수 시간이어야 하는 경로에서 경고할 지수
+
+# ---------------- 합성 채보 ----------------
+def mode_tracks(mode):
+    """TRACK_ORDER 중 mode에서 입력 가능한 트랙"""
+    playable = set(build_mode_mapping(mode)[1].values())
+    return [tr for tr in TRACK_ORDER if tr in playable]
+
+def generate_chart(path, n_notes, hold_ratio=0.1, spread=len(TRACK_ORDER), seed=0, mode=8):
+    """
+    겹치지 않는 유효한 채보를 path에 기록.
+    노트는 mode에서 입력 가능한 트랙 중 앞에서 spread개에 무작위로 나누고, hold_ratio 비율로 롱노트.
+    """
+    rng = random.Random(seed)
+    playable = mode_tracks(mode)
+    tracks = playable[:max(1, min(spread, len(playable)))]
+    cursor = {tr: GEN_TPS for tr in tracks}
+    notes = {tr: [] for tr in tracks}
+    for _ in range(n_notes):
+        tr = rng.choice(tracks)
+        tick = cursor[tr] + rng.choice(GEN_GAPS)
+        dur = rng.choice(GEN_HOLD_DURS) if rng.random() < hold_ratio else 0
+        notes[tr].append((tick, dur))
+        cursor[tr] = tick + dur
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<root>\n')
+        f.write(f'<header><songinfo tps="{GEN_TPS}"/></header>\n<note_list>\n')
+        for tr in tracks:
+            f.write(f'<track idx="{tr}">\n')
+            for tick, dur in notes[tr]:
+                if dur:
+                    f.write(f'<note tick="{tick}" dur="{dur}"/>\n')
+                else:
+                    f.write(f'<note tick="{tick}"/>\n')
+            f.write('</track>\n')
+        f.write('</note_list>\n</root>\n')
+    return path
+
+# ---------------- 측정 ----------------
+def measure(op, prepare=None):
+    """op(i)를 예산 안에서 반복 호출, 호출당 초 반환. prepare()는 측정에서 제외"""
+    if prepare:
+        prepare()
+    ops = 0
+    elapsed = 0.0
+    while ops < 3 or (elapsed < BENCH_BUDGET_S and ops < BENCH_MAX_OPS):
+        t0 = time.perf_counter()
+        op(ops)
+        elapsed += time.perf_counter() - t0
+        ops += 1
+    return elapsed / ops
+
+def chart_span(notes_by_track):
+    return max((n["e"] for notes in notes_by_track.values() for n in notes), default=1.0)
+
+def bench_size(path, mode=8, seed=0):
+    """한 크기의 채보에 대해 {벤치 이름: 호출당 초}"""
+    results = {}
+    t0 = time.perf_counter()
+    notes_by_track = load_notes_from_xml(path)
+    results["load_notes_from_xml"] = time.perf_counter() - t0
+
+    lane_tracks, key_to_track, side_len_lanes, miss_tracks = build_mode_mapping(mode)
+    engine = JudgeEngine(notes_by_track, miss_tracks)
+    span = chart_span(notes_by_track)
+    rng = random.Random(seed)
+    tracks = [tr for tr in key_to_track.values() if notes_by_track.get(tr)]
+    queries = [(rng.choice(tracks), rng.uniform(0.0, span)) for _ in range(BENCH_MAX_OPS)]
+
+    # 키 입력 1회: 가장 가까운 단노트 탐색 / 판정
+    results["find_nearest_nonhold"] = measure(lambda i: engine.find_nearest_nonhold(*queries[i]))
+    results["do_judge"] = measure(lambda i: engine.do_judge(*queries[i]), prepare=engine.reset)
+
+    # 시뮬레이션 스텝 1회: 곡 중간까지 진행해 둔 상태에서 SIM_DT씩 자동 miss 검사
+    mid = span / 2
+
+    def to_mid():
+        engine.reset()
+        engine.auto_miss_check(mid)
+    results["auto_miss_check"] = measure(lambda i: engine.auto_miss_check(mid + i * SIM_DT), prepare=to_mid)
+
+    # 프레임 1회: draw_notes와 같은 헬퍼로 기본 창/속도/두께의 화면 구간 컬링
+    index = build_note_index(notes_by_track)
+    px_per_s = NOTE_SPEED_MM_PER_S * PIXELS_PER_MM
+    screen_h = WINDOW_SIZE[1]
+    margin_px = 2 * int(BTN_THICKNESS_MM * PIXELS_PER_MM)  # normal + trigger 두께 (대략)
+
+    def cull(i):
+        t = mid + i / FPS
+        t_lo, t_hi = cull_window(t, px_per_s, screen_h, screen_h - MARGIN_BOTTOM, margin_px)
+        for tr in [LS_TRACK, RS_TRACK, TL_TRACK, TR_TRACK] + lane_tracks:
+            visible_notes(notes_by_track, index, tr, t_lo, t_hi, t)
+    results["visible_notes"] = measure(cull, prepare=engine.reset)
+
+    # 키 입력 1회: 키 -> 트랙 매핑 조회
+    keys = list(key_to_track) + [pygame.K_z]
+    results["key_to_track_lookup"] = measure(lambda i: key_to_track.get(keys[i % len(keys)]))
+    return results
+
+def scaling_exponent(n1, t1, n2, t2):
+    if t1 <= 0 or t2 <= 0:
+        return float("nan")
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+def format_time(sec):
+    if sec >= 1.0:
+        return f"{sec:.2f}s"
+    if sec >= 1e-3:
+        return f"{sec * 1e3:.2f}ms"
+    return f"{sec * 1e6:.1f}us"
+
+# 호출 빈도: 로드는 1회, 나머지는 프레임/시뮬레이션 스텝/키 입력마다
+PER_EVENT = ("find_nearest_nonhold", "do_judge", "auto_miss_check", "visible_notes", "key_to_track_lookup")
+
+def run_suite(sizes, hold_ratio, spread, seed, mode=8, csv_path=None):
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="dpcbench_") as tmp:
+        for n in sizes:
+            path = generate_chart(os.path.join(tmp, f"chart_{n}.xml"), n, hold_ratio, spread, seed, mode)
+            res = bench_size(path, mode, seed)
+            rows.append((n, res))
+            os.unlink(path)
+            print(f"  {n} notes: " + "  ".join(f"{k}={format_time(v)}" for k, v in res.items()))
+
+    names = list(rows[0][1])
+    print()
+    print(f"{'bench':<24}" + "".join(f"{n:>12}" for n, _ in rows) + f"{'exponent':>12}")
+    suspects = []
+    for name in names:
+        cells = "".join(f"{format_time(res[name]):>12}" for _, res in rows)
+        k = float("nan")
+        if len(rows) > 1:
+            (n1, r1), (n2, r2) = rows[0], rows[-1]
+            k = scaling_exponent(n1, r1[name], n2, r2[name])
+        print(f"{name:<24}{cells}{k:>12.2f}")
+        if name in PER_EVENT and k > SUSPECT_EXPONENT:
+            suspects.append((name, k))
+
+    if suspects:
+        print()
+        for name, k in suspects:
+            print(f"경고: {name} 호출당 시간이 노트 수에 따라 증가 (지수 {k:.2f}) - 프레임/키 입력마다 O(n)?")
+
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["notes"] + names)
+            for n, res in rows:
+                w.writerow([n] + [f"{res[name]:.9f}" for name in names])
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="채보 뷰어 핫패스 벤치마크")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    g = sub.add_parser("gen", help="합성 채보 생성")
+    g.add_argument("out")
+    g.add_argument("--notes", type=int, default=10000)
+
+    r = sub.add_parser("run", help="크기별 벤치마크")
+    r.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    r.add_argument("--csv", default=None, help="결과 CSV 경로")
+
+    for p in (g, r):
+        p.add_argument("--mode", type=int, default=8, choices=MODES, help="입력 가능한 트랙만 사용할 모드")
+        p.add_argument("--holds", type=float, default=0.1, help="롱노트 비율 (0~1)")
+        p.add_argument("--spread", type=int, default=len(TRACK_ORDER), help=f"사용할 트랙 수 (1~{len(TRACK_ORDER)})")
+        p.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "gen":
+        generate_chart(args.out, args.notes, args.holds, args.spread, args.seed, args.mode)
+        print("저장:", args.out)
+    else:
+        run_suite(sorted(args.sizes), args.holds, args.spread, args.seed, args.mode, args.csv)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# dpcexport.py
+# 실행: python dpcexport.py <채보.xml> <출력.mp4 | 출력 폴더> [--mode 8] [--fps 60] [--jobs N] [--autoplay]
+# 필요: pygame, (영상 출력 시) ffmpeg
+#
+# 미리보기 영상을 화면 녹화 대신 오프라인으로 만든다.
+# run_viewer(export=...)로 창 없이 고정 시간 간격 렌더링하고, 프레임 구간을
+# 여러 프로세스에 나눠서 이미지 시퀀스(PNG) 또는 ffmpeg 구간 영상으로 저장한 뒤
+# 구간 영상은 순서대로 이어 붙인다 (xml 폴더의 audio.ogg가 있으면 함께 합침).
+
+import os
+import sys
+import math
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from dpcviewer10 import DEFAULT_AUDIO_NAME, FPS, MODES, WINDOW_SIZE, load_notes_from_xml, run_viewer
+
+VIDEO_EXTS = (".mp4", ".mkv", ".mov", ".webm")
+TAIL_S = 2.0  # 마지막 노트 이후 여유 시간
+DEFAULT_SIZE = WINDOW_SIZE
+
+def chart_frame_count(xml_path, fps):
+    notes_by_track = load_notes_from_xml(xml_path)
+    end = max((n["e"] for notes in notes_by_track.values() for n in notes), default=0.0)
+    return int(math.ceil((end + TAIL_S) * fps))
+
+def split_frames(total, parts):
+    """[0, total)을 parts개의 연속 구간으로"""
+    parts = max(1, min(parts, total))
+    step = int(math.ceil(total / parts))
+    return [(a, min(a + step, total)) for a in range(0, total, step)]
+
+def encoder_cmd(size, fps, out_path):
+    w, h = size
+    return [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", str(fps), "-i", "-",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        out_path,
+    ]
+
+# ---------------- 워커 ----------------
+def render_segment(xml_path, mode, start, end, fps, size, autoplay, out):
+    """프로세스 하나가 [start, end) 프레임을 렌더링. out이 폴더면 PNG, 아니면 영상 구간 파일"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import pygame
+
+    encoder = None
+    if os.path.isdir(out):
+        def sink(frame, surface):
+            pygame.image.save(surface, os.path.join(out, f"frame_{frame:06d}.png"))
+    else:
+        encoder = subprocess.Popen(encoder_cmd(size, fps, out), stdin=subprocess.PIPE)
+
+        def sink(frame, surface):
+            encoder.stdin.write(pygame.image.tobytes(surface, "RGB"))
+
+    try:
+        run_viewer(xml_path, mode, export={
+            "start": start, "end": end, "fps": fps, "size": size,
+            "autoplay": autoplay, "sink": sink,
+        })
+    finally:
+        if encoder is not None:
+            encoder.stdin.close()
+            encoder.wait()
+    if encoder is not None and encoder.returncode != 0:
+        raise RuntimeError(f"ffmpeg 실패 (구간 {start}-{end}, 코드 {encoder.returncode})")
+    return end - start
+
+def concat_segments(segments, out_path, audio_path=None):
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        for seg in segments:
+            f.write(f"file '{os.path.abspath(seg)}'\n")
+        list_path = f.name
+    cmd = ["ffmpeg", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        cmd += ["-i", audio_path, "-c:v", "copy", "-c:a", "aac", "-shortest"]
+    else:
+        cmd += ["-c", "copy"]
+    try:
+        subprocess.run(cmd + [out_path], check=True)
+    finally:
+        os.unlink(list_path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="채보 미리보기 오프라인 내보내기")
+    ap.add_argument("xml", help="채보 xml")
+    ap.add_argument("out", help=f"영상 파일 ({'/'.join(VIDEO_EXTS)}) 또는 PNG 시퀀스 폴더")
+    ap.add_argument("--mode", type=int, default=8, choices=MODES)
+    ap.add_argument("--fps", type=int, default=FPS)
+    ap.add_argument("--size", type=int, nargs=2, default=DEFAULT_SIZE, metavar=("W", "H"))
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="프로세스 수")
+    ap.add_argument("--autoplay", action="store_true", help="완벽한 오토플레이로 판정/키빔 표시 (없으면 판정 없이 노트만)")
+    args = ap.parse_args(argv)
+
+    total = chart_frame_count(args.xml, args.fps)
+    ranges = split_frames(total, args.jobs)
+    size = tuple(args.size)
+    as_video = args.out.lower().endswith(VIDEO_EXTS)
+
+    if as_video:
+        if shutil.which("ffmpeg") is None:
+            print("ffmpeg를 찾을 수 없습니다. 폴더를 지정하면 PNG 시퀀스로 저장합니다.")
+            return 2
+        work_dir = tempfile.mkdtemp(prefix="dpcexport_")
+        outs = [os.path.join(work_dir, f"seg_{i:03d}.mp4") for i in range(len(ranges))]
+    else:
+        os.makedirs(args.out, exist_ok=True)
+        work_dir = None
+        outs = [args.out] * len(ranges)
+
+    print(f"{total} 프레임 ({total / args.fps:.1f}s) -> {len(ranges)}개 구간")
+    try:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [
+                pool.submit(render_segment, args.xml, args.mode, a, b, args.fps, size, args.autoplay, out)
+                for (a, b), out in zip(ranges, outs)
+            ]
+            for (a, b), fut in zip(ranges, futures):
+                fut.result()
+                print(f"  프레임 {a}-{b - 1} 완료")
+        if as_video:
+            audio_path = os.path.join(os.path.dirname(args.xml), DEFAULT_AUDIO_NAME)
+            concat_segments(outs, args.out, audio_path if os.path.exists(audio_path) else None)
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print("저장:", args.out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
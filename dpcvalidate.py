@@ -0,0 +1,196 @@
+# dpcvalidate.py
+# 실행: python dpcvalidate.py <채보 폴더 또는 xml...> [--modes 4 5 6 8] [--jobs N]
+# 필요: pygame (키 상수만 사용, 창은 열지 않음)
+#
+# 배포 전 채보 검증: 형식 오류, 같은 트랙 노트 겹침, 롱노트-다음 노트 겹침,
+# 그리고 run_viewer와 같은 판정 로직(JudgeEngine, 고정 스텝)으로 완벽한 오토플레이를
+# 돌려 풀콤보가 가능한지 확인한다. 위반 사항은 tick과 함께 보고.
+
+import os
+import re
+import sys
+import argparse
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from dpcviewer10 import (
+    MISS_THRESHOLD_MS, MODES, SIM_DT,
+    JudgeEngine, autoplay_events, build_mode_mapping, make_note,
+)
+
+DEFAULT_TPS = 480.0
+MODE_IN_NAME = re.compile(r"_(\d)b(?:[_.]|$)", re.IGNORECASE)
+
+# ---------------- 형식 검사 ----------------
+def check_wellformed(root):
+    """
+    XML 구조/속성 검사. (위반 목록 [(track, tick, msg)], notes_by_track)
+    notes_by_track은 위반으로 보고한 track/note를 뺀 나머지로 만들어서,
+    노트 하나가 깨져 있어도 겹침/오토플레이 검사는 계속 할 수 있게 한다
+    """
+    violations = []
+    notes_by_track = defaultdict(list)
+    tps = DEFAULT_TPS
+    si = root.find("header/songinfo")
+    if si is None or not si.get("tps"):
+        violations.append((None, None, "header/songinfo@tps 없음 (480으로 간주)"))
+    else:
+        try:
+            if float(si.get("tps")) <= 0:
+                violations.append((None, None, f"tps가 양수가 아님: {si.get('tps')} (480으로 간주)"))
+            else:
+                tps = float(si.get("tps"))
+        except ValueError:
+            violations.append((None, None, f"tps 값 오류: {si.get('tps')} (480으로 간주)"))
+
+    note_list = root.find("note_list")
+    if note_list is None:
+        violations.append((None, None, "note_list 없음"))
+        return violations, notes_by_track
+
+    for tr in note_list.findall("track"):
+        try:
+            idx = int(tr.get("idx"))
+        except (TypeError, ValueError):
+            violations.append((None, None, f"track idx 오류: {tr.get('idx')!r}"))
+            continue
+        for n in tr.findall("note"):
+            try:
+                tick = int(n.get("tick"))
+                dur = int(n.get("dur") or 0)
+            except (TypeError, ValueError):
+                violations.append((idx, n.get("tick"), f"note 속성 오류: tick={n.get('tick')!r} dur={n.get('dur')!r}"))
+                continue
+            if tick < 0 or dur < 0:
+                violations.append((idx, tick, f"음수 tick/dur: dur={dur}"))
+                continue
+            notes_by_track[idx].append(make_note(tick, dur, tps))
+    for notes in notes_by_track.values():
+        notes.sort(key=lambda x: x["s"])
+    return violations, notes_by_track
+
+def check_overlaps(notes_by_track):
+    """같은 트랙에서 겹치는 노트 / 다음 노트와 겹치는 롱노트"""
+    violations = []
+    for tr in sorted(notes_by_track):
+        notes = notes_by_track[tr]
+        for prev, n in zip(notes, notes[1:]):
+            if n["tick"] == prev["tick"]:
+                violations.append((tr, n["tick"], "같은 tick에 노트 중복"))
+            elif prev["hold"] and n["s"] < prev["e"]:
+                violations.append((tr, prev["tick"], f"롱노트가 다음 노트(tick {n['tick']})와 겹침"))
+    return violations
+
+# ---------------- 오토플레이 ----------------
+def simulate_autoplay(notes_by_track, mode):
+    """완벽한 플레이어로 run_viewer 판정 로직을 실행. 위반 목록 반환"""
+    lane_tracks, key_to_track, side_len_lanes, miss_tracks = build_mode_mapping(mode)
+    playable = set(key_to_track.values())
+    violations = []
+
+    for tr in sorted(set(notes_by_track) - playable):
+        notes = notes_by_track[tr]
+        if notes:
+            violations.append((tr, notes[0]["tick"], f"{mode}키에서 입력할 수 없는 트랙 (노트 {len(notes)}개)"))
+
+    def on_judgement(name, track, note, t):
+        if name != "Perfect":
+            violations.append((track, note.get("tick"), f"{name} 판정 (t={t:.3f}s)"))
+
+    engine = JudgeEngine(notes_by_track, miss_tracks, on_judgement=on_judgement)
+    engine.reset()
+
+    # 메인 루프와 같은 순서: 입력 시각까지 고정 스텝을 진행한 뒤 판정
+    for t, kind, tr in autoplay_events(notes_by_track, playable):
+        engine.advance(t)
+        if kind == "press":
+            engine.press(tr, t)
+        else:
+            engine.release(tr, t)
+    end = max((n["e"] for tr in playable for n in notes_by_track.get(tr, [])), default=0.0)
+    engine.advance(end + MISS_THRESHOLD_MS / 1000.0 + 2 * SIM_DT)
+
+    total = sum(len(notes_by_track.get(tr, [])) for tr in playable)
+    for tr in sorted(playable):
+        for n in notes_by_track.get(tr, []):
+            if not n["hit"] and not n["missed"]:
+                violations.append((tr, n["tick"], "판정되지 않은 노트"))
+    if engine.max_combo != total:
+        violations.append((None, None, f"풀콤보 불가: 최대 콤보 {engine.max_combo} / 노트 {total}"))
+    return violations
+
+# ---------------- 파일 단위 ----------------
+def modes_for(path, modes):
+    if modes:
+        return modes
+    m = MODE_IN_NAME.search(os.path.basename(path))
+    if m and int(m.group(1)) in MODES:
+        return (int(m.group(1)),)
+    return MODES
+
+def validate_file(path, modes=None):
+    """[(mode 또는 None, track, tick, msg)]"""
+    try:
+        root = ET.parse(path).getroot()
+    except (ET.ParseError, OSError) as e:
+        return path, [(None, None, None, f"XML 파싱 실패: {e}")]
+    violations, notes_by_track = check_wellformed(root)
+    report = [(None,) + v for v in violations]
+    report += [(None,) + v for v in check_overlaps(notes_by_track)]
+    for mode in modes_for(path, modes):
+        report += [(mode,) + v for v in simulate_autoplay(notes_by_track, mode)]
+    return path, report
+
+def collect_paths(inputs):
+    paths = []
+    for p in inputs:
+        if os.path.isdir(p):
+            for name in sorted(os.listdir(p)):
+                if name.lower().endswith(".xml"):
+                    paths.append(os.path.join(p, name))
+        else:
+            paths.append(p)
+    return paths
+
+def format_violation(mode, track, tick, msg):
+    where = []
+    if mode is not None:
+        where.append(f"{mode}키")
+    if track is not None:
+        where.append(f"track {track}")
+    if tick is not None:
+        where.append(f"tick {tick}")
+    return f"  [{' '.join(where) or '-'}] {msg}"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="채보 헤드리스 오토플레이 검증기")
+    ap.add_argument("paths", nargs="+", help="채보 xml 또는 폴더")
+    ap.add_argument("--modes", type=int, nargs="+", choices=MODES,
+                    help="검사할 모드 (기본: 파일명 _Nb 추론, 없으면 전체)")
+    ap.add_argument("--jobs", type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+    args = ap.parse_args(argv)
+
+    paths = collect_paths(args.paths)
+    if not paths:
+        print("검사할 xml 파일이 없습니다.")
+        return 2
+
+    modes = tuple(args.modes) if args.modes else None
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for path, report in pool.map(validate_file, paths, [modes] * len(paths)):
+            if report:
+                failed += 1
+                print(f"FAIL {path} ({len(report)}건)")
+                for v in report:
+                    print(format_violation(*v))
+            else:
+                print(f"OK   {path}")
+    print(f"{len(paths) - failed}/{len(paths)} 통과")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,17 +3,36 @@
 # 필요: pygame, tkinter
 
 import os
+import io
 import sys
 import time
+import glob
 import math
+import json
+import ctypes
+import ctypes.util
+import queue
+import struct
+import platform
+import threading
 import xml.etree.ElementTree as ET
-from collections import defaultdict
-import tkinter as tk
-from tkinter import filedialog, messagebox
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, OrderedDict
+from concurrent.futures import Future
 import pygame
 
 # ---------------- CONFIG ----------------
-FPS = 60
+FPS = 60            # 기본 프레임레이트 (내보내기, 주사율을 모를 때)
+RENDER_FPS = None   # 화면 프레임 상한: None = 디스플레이에 맞춤(vsync/주사율), 0 = 제한 없음, N = N fps
+VSYNC = False       # True면 vsync 창 시도. SCALED 렌더러라 창 크기를 바꾸면 레이아웃 대신 확대되고
+                    # HiDPI에서는 정수배로 커질 수 있음 (기본은 RESIZABLE + 주사율 상한)
+VSYNC_PROBE_FLIPS = 12
+VSYNC_MIN_WAIT_S = 0.001   # flip 안에서 이만큼도 잠들지 않으면 vsync가 무시된 것으로 본다
+VSYNC_GUARD = 2.0          # vsync 중에도 주사율 x 이 값으로 상한 (도중에 vsync가 풀려도 폭주 방지)
+SIM_HZ = 240        # 판정/자동 miss 고정 시뮬레이션 주기 (렌더링과 무관)
+SIM_DT = 1.0 / SIM_HZ
+MODES = (4, 5, 6, 8)
 
 # 판정 윈도우 (ms)
 J_WINDOWS = [("Perfect", 42), ("Great", 80), ("Good", 150), ("Bad", 200)]
@@ -28,7 +47,41 @@ THICKNESS_STEP_MM = 0.5
 PIXELS_PER_MM = 96.0 / 25.4
 JUDGE_LINE_THICKNESS_PX = int(9 * 3)  # 판정선 두께(요구: 3배)
 
+# 창 크기/레이아웃 (px)
+WINDOW_SIZE = (1280, 820)
+MARGIN_X, MARGIN_BOTTOM, LANE_GAP = 60, 140, 8
+
 DEFAULT_AUDIO_NAME = "audio.ogg"
+DEFAULT_SKIN_NAME = "noteskin.png"  # 있으면 노트 스킨으로 사용 (xml 폴더)
+
+# 파싱된 채보 LRU 캐시 (메모리 추정치 기준 상한)
+CHART_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 노트 스프라이트 종류 (아틀라스 열 순서 = 스킨 이미지 열 순서)
+NOTE_KINDS = ("lane", "lane_blue", "side", "trigger")
+
+# 입력/오디오 지연 보정 (기기별 오프셋 저장)
+CALIBRATION_PATH = os.path.join(os.path.expanduser("~"), ".dpcviewer_calibration.json")
+CALIB_BPM = 120.0
+CALIB_BEATS = 32
+CALIB_LEAD_IN_S = 2.0
+CALIB_MIN_SAMPLES = 8
+CALIB_CLICK_HZ = (1500.0, 1000.0)  # (강박, 약박)
+CALIB_CLICK_MS = 30
+
+# 오프라인 내보내기: 오토플레이 단노트 키빔 표시 시간
+AUTOPLAY_BEAM_S = 0.08
+
+# 타이밍 통계 (signed 오차, ms)
+TIMING_SAMPLE_CAP = 4096
+TIMING_HIST_BIN_MS = 10
+
+# 세션 텔레메트리 (판정/콤보 끊김/일시정지 기록)
+TELEMETRY_ENABLED = True
+TELEMETRY_DIR = os.path.join(os.path.expanduser("~"), ".dpcviewer_sessions")
+TELEMETRY_FORMAT = "columnar"  # "columnar" (.dpctel) 또는 "jsonl"
+TELEMETRY_RING_RECORDS = 65536
+TELEMETRY_FLUSH_S = 0.5
 
 # 트랙 인덱스 상수
 LS_TRACK = 2
@@ -47,13 +100,17 @@ JUDGE_COLORS = {
 
 # ---------------- UI: 모드 선택 및 파일 열기 ----------------
 def choose_mode_and_file():
+    # 검증기/내보내기/벤치처럼 창 없이 import하는 도구는 Tk 없는 파이썬에서도 동작하도록
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+
     root = tk.Tk()
     root.title("채보 뷰어 - 모드 선택 및 파일 열기")
-    choice = {"mode": None, "file": None}
+    choice = {"mode": None, "file": None, "calibrate": False}
 
     tk.Label(root, text="모드를 선택하세요 (4 / 5 / 6 / 8):").pack(padx=12, pady=6)
     var = tk.IntVar(value=8)
-    for m in (4, 5, 6, 8):
+    for m in MODES:
         tk.Radiobutton(root, text=f"{m}키", variable=var, value=m).pack(anchor="w", padx=20)
 
     file_label = tk.StringVar(value="선택된 파일 없음")
@@ -72,23 +129,50 @@ def choose_mode_and_file():
             return
         root.destroy()
 
+    def do_calibrate():
+        # 보정 모드는 XML 없이 메트로놈 채보를 사용
+        choice["mode"] = var.get()
+        choice["calibrate"] = True
+        root.destroy()
+
     btn_frame = tk.Frame(root)
     btn_frame.pack(pady=8)
     tk.Button(btn_frame, text="파일 선택", command=pick_file).pack(side="left", padx=6)
     tk.Button(btn_frame, text="불러오기", command=do_ok).pack(side="left", padx=6)
+    tk.Button(btn_frame, text="지연 보정", command=do_calibrate).pack(side="left", padx=6)
     tk.Button(btn_frame, text="취소", command=root.destroy).pack(side="left", padx=6)
 
     root.mainloop()
-    return choice["mode"], choice["file"]
+    return choice["mode"], choice["file"], choice["calibrate"]
 
 # ---------------- XML 파싱 ----------------
-def load_notes_from_xml(path):
+def make_note(tick, dur, tps):
+    """note 요소 하나(tick, dur)를 판정/렌더링용 dict로"""
+    return {
+        "s": tick / tps,
+        "e": (tick + dur) / tps,
+        "tick": tick,
+        "hold": dur > 0,
+        "hit": False,
+        "missed": False,
+        "holding": False,       # currently pressing
+        "held_success": False   # successfully held (for scoring)
+    }
+
+def load_notes_from_xml(path, progress=None):
+    """progress(dict)가 주어지면 progress["chart"]에 진행 상태를 기록 (백그라운드 로딩 표시용)"""
+    def report(msg):
+        if progress is not None:
+            progress["chart"] = msg
+
     notes_by_track = defaultdict(list)
+    report("parsing")
     try:
         tree = ET.parse(path)
         root = tree.getroot()
     except Exception as e:
         print("XML 파싱 실패:", e)
+        report("failed")
         return notes_by_track
 
     tps = 480.0
@@ -101,33 +185,231 @@ def load_notes_from_xml(path):
             except:
                 pass
 
-    def tick_to_sec(tick):
-        return tick / tps
-
     note_list = root.find("note_list")
     if note_list is None:
+        report("ready")
         return notes_by_track
 
-    for tr in note_list.findall("track"):
+    tracks = note_list.findall("track")
+    for i, tr in enumerate(tracks):
+        report(f"converting {i + 1}/{len(tracks)}")
         idx = int(tr.get("idx"))
         for n in tr.findall("note"):
             tick = int(n.get("tick"))
             dur = int(n.get("dur") or 0)
-            s = tick_to_sec(tick)
-            e = tick_to_sec(tick + dur)
-            notes_by_track[idx].append({
-                "s": s,
-                "e": e,
-                "hold": dur > 0,
-                "hit": False,
-                "missed": False,
-                "holding": False,       # currently pressing
-                "held_success": False   # successfully held (for scoring)
-            })
+            notes_by_track[idx].append(make_note(tick, dur, tps))
+    report("sorting")
     for k in notes_by_track:
         notes_by_track[k].sort(key=lambda x: x["s"])
+    report("ready")
     return notes_by_track
 
+# ---------------- 오디오 로드 ----------------
+def load_audio(path, progress=None):
+    """
+    music 스트림 준비. 파일을 통째로 메모리에 읽어두고 거기서 열기 때문에
+    재생 중에는 (네트워크) 디스크를 다시 읽지 않는다. 백그라운드 스레드에서 호출 가능.
+    """
+    def report(msg):
+        if progress is not None:
+            progress["audio"] = msg
+
+    if not os.path.exists(path):
+        report("none")
+        return False
+    try:
+        report("reading")
+        with open(path, "rb") as f:
+            data = f.read()
+        report("decoding")
+        pygame.mixer.music.load(io.BytesIO(data), os.path.splitext(path)[1].lstrip("."))
+    except Exception as e:
+        print("오디오 로드 실패:", e)
+        report("failed")
+        return False
+    report("ready")
+    return True
+
+# ---------------- 백그라운드 작업 ----------------
+class DaemonPool:
+    """
+    ThreadPoolExecutor 대신 쓰는 최소 작업 풀 (submit -> Future).
+    워커가 daemon 스레드라서 큰 채보를 파싱하는 도중(중간 취소 불가)에 ESC로 끝내도
+    인터프리터 종료가 그 파싱을 기다리지 않는다.
+    """
+    def __init__(self, workers, name="dpc-loader"):
+        self._queue = queue.SimpleQueue()
+        self._workers = workers
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True).start()
+
+    def submit(self, fn, *args):
+        fut = Future()
+        self._queue.put((fut, fn, args))
+        return fut
+
+    def shutdown(self):
+        """대기 중인 작업은 취소하고, 실행 중인 작업은 기다리지 않는다"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].cancel()
+        for _ in range(self._workers):
+            self._queue.put(None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            fut, fn, args = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+
+# ---------------- 채보 캐시 ----------------
+def estimate_chart_bytes(notes_by_track):
+    """노트 dict 하나의 크기 x 개수로 대략적인 메모리 사용량 추정"""
+    total = sys.getsizeof(notes_by_track)
+    for notes in notes_by_track.values():
+        total += sys.getsizeof(notes)
+        if notes:
+            n = notes[0]
+            total += (sys.getsizeof(n) + sum(sys.getsizeof(v) for v in n.values())) * len(notes)
+    return total
+
+def sibling_charts(path):
+    """같은 폴더의 xml 채보 목록 (정렬, path 포함)"""
+    folder = os.path.dirname(os.path.abspath(path))
+    try:
+        names = sorted(n for n in os.listdir(folder) if n.lower().endswith(".xml"))
+    except OSError:
+        return [os.path.abspath(path)]
+    return [os.path.join(folder, n) for n in names]
+
+class ChartCache:
+    """
+    파싱된 채보의 LRU 캐시. 항목은 (notes_by_track, note_index)로, 컬링 인덱스도
+    로더 스레드에서 만들어 같이 보관한다. 상한은 estimate_chart_bytes 합계 기준.
+    preload()는 백그라운드 스레드에서 파싱하되, 자리가 없으면 다른 항목을 밀어내지 않고 버린다.
+    build_mode_mapping 결과도 모드별로 보관.
+    파싱에 실패한 경로는 기억해 두고 preload와 채보 넘기기에서 건너뛴다.
+    캐시된 노트 dict의 판정 플래그는 JudgeEngine.set_chart()가 채보를 떠날 때 되돌려 놓는다.
+    """
+    def __init__(self, max_bytes=CHART_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()  # path -> (mtime, (notes_by_track, note_index), nbytes)
+        self._mappings = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._failed = set()
+        self._pool = DaemonPool(1, name="dpc-preload")
+
+    @staticmethod
+    def _key(path):
+        path = os.path.abspath(path)
+        try:
+            return path, os.path.getmtime(path)
+        except OSError:
+            return path, None
+
+    def get(self, path, check_mtime=True):
+        """
+        캐시 적중 시 (notes_by_track, note_index), 아니면 None (파일이 바뀌었으면 무효).
+        check_mtime=False는 stat 없이 조회 (메인 스레드용, 확인은 로더에서 따로)
+        """
+        if check_mtime:
+            path, mtime = self._key(path)
+        else:
+            path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            if check_mtime and entry[0] != mtime:
+                self._drop(path)
+                return None
+            self._entries.move_to_end(path)
+            return entry[1]
+
+    def load(self, path, progress=None):
+        """캐시에서 꺼내거나 파싱 후 넣는다 (백그라운드 로더에서 호출)"""
+        chart = self.get(path)
+        if chart is not None:
+            if progress is not None:
+                progress["chart"] = "ready (cached)"
+            return chart
+        try:
+            notes_by_track = load_notes_from_xml(path, progress)
+        except Exception:
+            self._mark_failed(path)
+            raise
+        chart = (notes_by_track, build_note_index(notes_by_track))
+        self._insert(path, chart, evict=True)
+        return chart
+
+    def failed(self, path):
+        """이전에 파싱에 실패한 경로인지 (stat 없이, 메인 스레드용)"""
+        return os.path.abspath(path) in self._failed
+
+    def preload(self, paths):
+        for p in paths:
+            key = os.path.abspath(p)
+            with self._lock:
+                if key in self._entries or key in self._pending or key in self._failed:
+                    continue
+                self._pending.add(key)
+            self._pool.submit(self._preload_one, key)
+
+    def mapping(self, mode):
+        if mode not in self._mappings:
+            self._mappings[mode] = build_mode_mapping(mode)
+        return self._mappings[mode]
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+    def _preload_one(self, path):
+        try:
+            notes_by_track = load_notes_from_xml(path)
+            self._insert(path, (notes_by_track, build_note_index(notes_by_track)), evict=False)
+        except Exception as e:
+            print("채보 미리 읽기 실패:", path, e)
+            self._mark_failed(path)
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def _mark_failed(self, path):
+        with self._lock:
+            self._failed.add(os.path.abspath(path))
+
+    def _insert(self, path, chart, evict):
+        path, mtime = self._key(path)
+        # 인덱스의 시작 시각 목록은 노트 dict와 같은 float 객체를 가리키므로 리스트 크기만 더한다
+        nbytes = estimate_chart_bytes(chart[0]) + sum(sys.getsizeof(starts) for starts, _ in chart[1].values())
+        with self._lock:
+            self._drop(path)
+            if not evict and self.nbytes + nbytes > self.max_bytes:
+                return False
+            while self._entries and self.nbytes + nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+            self._entries[path] = (mtime, chart, nbytes)
+            self.nbytes += nbytes
+            return True
+
+    def _drop(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
 # ---------------- 모드 매핑 ----------------
 def build_mode_mapping(mode):
     """
@@ -197,29 +479,779 @@ def mm_to_px(mm):
 def clamp(v, a, b):
     return max(a, min(b, v))
 
+# ---------------- 타이밍 통계 / 지연 보정 ----------------
+class TimingStats:
+    """
+    signed 판정 오차(ms, 음수=빠름 / 양수=느림)를 누적.
+    샘플은 미리 할당된 배열에 링 형태로 저장하고,
+    평균/표준편차(Welford)와 히스토그램은 입력마다 O(1)로 갱신.
+    """
+    def __init__(self, capacity=TIMING_SAMPLE_CAP, bin_ms=TIMING_HIST_BIN_MS, range_ms=MISS_THRESHOLD_MS):
+        self.capacity = capacity
+        self.bin_ms = bin_ms
+        self.range_ms = range_ms
+        self.samples = array("d", [0.0]) * capacity
+        self.hist = [0] * (2 * int(math.ceil(range_ms / bin_ms)))
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        for i in range(len(self.hist)):
+            self.hist[i] = 0
+
+    def add(self, err_ms):
+        self.samples[self.count % self.capacity] = err_ms
+        self.count += 1
+        delta = err_ms - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (err_ms - self._mean)
+        b = int((err_ms + self.range_ms) // self.bin_ms)
+        self.hist[clamp(b, 0, len(self.hist) - 1)] += 1
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self.count - 1))
+
+def machine_id():
+    return platform.node() or "default"
+
+def _read_calibration_file():
+    try:
+        with open(CALIBRATION_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def load_calibration_offset():
+    """이 기기에 저장된 오프셋(ms). 없으면 0."""
+    entry = _read_calibration_file().get(machine_id())
+    if not isinstance(entry, dict):
+        return 0.0
+    try:
+        return float(entry.get("offset_ms", 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def save_calibration_offset(stats):
+    data = _read_calibration_file()
+    data[machine_id()] = {
+        "offset_ms": round(stats.mean, 2),
+        "std_ms": round(stats.std, 2),
+        "samples": stats.count,
+        "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    try:
+        with open(CALIBRATION_PATH, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    except OSError as e:
+        print("보정값 저장 실패:", e)
+        return False
+    return True
+
+def build_metronome_chart(track):
+    """보정용 메트로놈 채보: 한 트랙에 CALIB_BPM 박자마다 단노트"""
+    beat = 60.0 / CALIB_BPM
+    notes_by_track = defaultdict(list)
+    for i in range(CALIB_BEATS):
+        s = CALIB_LEAD_IN_S + i * beat
+        notes_by_track[track].append({
+            "s": s, "e": s, "hold": False,
+            "hit": False, "missed": False, "holding": False, "held_success": False
+        })
+    return notes_by_track
+
+def build_metronome_sound():
+    """채보와 같은 박자의 클릭 트랙 (한 번에 재생 -> 샘플 단위로 정확)"""
+    init = pygame.mixer.get_init()
+    if not init:
+        return None
+    freq, size, channels = init
+    if size != -16:
+        return None
+    beat = 60.0 / CALIB_BPM
+    total = int((CALIB_LEAD_IN_S + CALIB_BEATS * beat + 0.5) * freq)
+    buf = array("h", [0]) * (total * channels)
+    click_len = int(freq * CALIB_CLICK_MS / 1000.0)
+    for i in range(CALIB_BEATS):
+        hz = CALIB_CLICK_HZ[0] if i % 4 == 0 else CALIB_CLICK_HZ[1]
+        start = int((CALIB_LEAD_IN_S + i * beat) * freq)
+        for j in range(min(click_len, total - start)):
+            env = 1.0 - j / click_len
+            v = int(20000 * env * math.sin(2 * math.pi * hz * j / freq))
+            base = (start + j) * channels
+            for c in range(channels):
+                buf[base + c] = v
+    return pygame.mixer.Sound(buffer=buf.tobytes())
+
+# ---------------- 노트 아틀라스 ----------------
+def build_note_atlas(sizes, colors, strip_h, skin=None):
+    """
+    노트 스프라이트를 한 Surface에 미리 그려둔다 (종류별로 한 열).
+    각 열은 위쪽 머리(단노트/단타 바, 높이 th) + 아래쪽 몸통 띠(롱노트, strip_h + period).
+      sizes[kind] = (w, th), colors[kind] = 단색
+      skin: NOTE_KINDS 순서로 4열인 이미지. 열마다 위 절반 = 머리, 아래 절반 = 몸통 타일
+    반환: (surface, cells)  cells[kind] = (x, w, head_h, period)
+    """
+    tiles = {}
+    if skin is not None:
+        col_w = skin.get_width() // len(NOTE_KINDS)
+        half = skin.get_height() // 2
+        for i, kind in enumerate(NOTE_KINDS):
+            w, th = sizes[kind]
+            head = skin.subsurface((i * col_w, 0, col_w, half))
+            body = skin.subsurface((i * col_w, half, col_w, skin.get_height() - half))
+            tiles[kind] = (
+                pygame.transform.smoothscale(head, (w, th)),
+                pygame.transform.smoothscale(body, (w, body.get_height())),
+            )
+
+    periods = {kind: (tiles[kind][1].get_height() if kind in tiles else 1) for kind in NOTE_KINDS}
+    atlas_w = sum(sizes[kind][0] for kind in NOTE_KINDS)
+    atlas_h = max(sizes[kind][1] + strip_h + periods[kind] for kind in NOTE_KINDS)
+    surf = pygame.Surface((atlas_w, atlas_h), pygame.SRCALPHA if skin is not None else 0)
+    if pygame.display.get_surface() is not None:
+        surf = surf.convert_alpha() if skin is not None else surf.convert()
+
+    cells = {}
+    x = 0
+    for kind in NOTE_KINDS:
+        w, th = sizes[kind]
+        body_h = strip_h + periods[kind]
+        if kind in tiles:
+            head, body = tiles[kind]
+            surf.blit(head, (x, 0))
+            for y in range(th, th + body_h, periods[kind]):
+                surf.blit(body, (x, y))
+        else:
+            surf.fill(colors[kind], (x, 0, w, th + body_h))
+        cells[kind] = (x, w, th, periods[kind])
+        x += w
+    return surf, cells
+
+def load_note_skin(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        skin = pygame.image.load(path)
+    except Exception as e:
+        print("노트 스킨 로드 실패:", e)
+        return None
+    if skin.get_width() < len(NOTE_KINDS) or skin.get_height() < 2:
+        print("노트 스킨 크기가 너무 작습니다:", path)
+        return None
+    # smoothscale은 24/32비트만 받는다 (PNG 최적화 도구가 만든 8비트/팔레트 이미지 대비).
+    # convert_alpha()는 창이 있어야 하므로 내보내기에서도 되도록 32비트 Surface에 옮겨 그린다
+    rgba = pygame.Surface(skin.get_size(), pygame.SRCALPHA, 32)
+    rgba.blit(skin, (0, 0))
+    return rgba
+
+# ---------------- 판정 엔진 ----------------
+def time_error_ms(note, t):
+    return (t - note["s"]) * 1000.0
+
+# 노트 보이기 규칙: hold이면 end까지 + buffer로 보여줘야 함
+def should_show(n, t):
+    if n["hold"]:
+        return t <= n["e"] + 1.0  # buffer 1s
+    return not n["hit"] and not n["missed"]
+
+# 화면 컬링용 트랙별 인덱스: (시작 시각 목록, 최장 롱노트 길이)
+def build_note_index(notes_by_track):
+    index = {}
+    for tr, notes in notes_by_track.items():
+        starts = [n["s"] for n in notes]
+        max_hold = max((n["e"] - n["s"] for n in notes), default=0.0)
+        index[tr] = (starts, max_hold)
+    return index
+
+def visible_range(entry, t_lo, t_hi):
+    """[t_lo, t_hi] 시간 구간에 걸칠 수 있는 노트의 인덱스 범위 (이분 탐색)"""
+    starts, max_hold = entry
+    return bisect_left(starts, t_lo - max_hold), bisect_right(starts, t_hi)
+
+def cull_window(t, px_per_s, screen_h, target_y, margin_px):
+    """화면(판정선 target_y, 높이 screen_h) 안에 들어올 수 있는 채보 시간 구간 (t_lo, t_hi)"""
+    return t - (screen_h - target_y + margin_px) / px_per_s, t + (target_y + margin_px) / px_per_s
+
+def visible_notes(notes_by_track, note_index, track, t_lo, t_hi, t):
+    """트랙에서 [t_lo, t_hi]에 걸치고 should_show인 노트 (draw_notes와 벤치마크 공용)"""
+    notes = notes_by_track.get(track)
+    if not notes:
+        return []
+    i0, i1 = visible_range(note_index[track], t_lo, t_hi)
+    return [n for n in notes[i0:i1] if should_show(n, t)]
+
+class JudgeEngine:
+    """
+    판정 상태와 규칙 (run_viewer와 헤드리스 검증기가 공유).
+    판정이 날 때마다 on_judgement(name, track, note, t) 호출.
+    플래그를 바꾼 노트는 _touched에 모아 두고 reset()은 그 노트만 되돌린다
+    (채보 크기와 무관하게 플레이한 만큼만 비용). 넘겨받는 채보는 깨끗해야 한다.
+    """
+    def __init__(self, notes_by_track, miss_tracks, stats=None, on_judgement=None):
+        self.notes_by_track = notes_by_track
+        self.miss_tracks = miss_tracks
+        self.stats = stats
+        self.on_judgement = on_judgement
+        self.counts = {k: 0 for k, _ in J_WINDOWS}
+        self.counts["Miss"] = 0
+        self.combo = 0
+        self.max_combo = 0
+        self.sim_step = 0        # 고정 스텝 시뮬레이션 진행 (sim 시간 = sim_step * SIM_DT)
+        self._miss_cursor = {}   # 트랙별 첫 미판정 노트 위치
+        self._touched = []       # 판정 플래그를 바꾼 노트 (중복 가능)
+
+    def set_chart(self, notes_by_track, miss_tracks):
+        # 떠나는 채보를 깨끗하게 되돌려 둔다 (캐시에 남아 다시 쓰일 수 있음)
+        self.reset()
+        self.notes_by_track = notes_by_track
+        self.miss_tracks = miss_tracks
+
+    def reset(self):
+        for n in self._touched:
+            n["hit"] = n["missed"] = n["holding"] = n["held_success"] = False
+        self._touched.clear()
+        for k in self.counts:
+            self.counts[k] = 0
+        self.combo = 0
+        self.max_combo = 0
+        self.sim_step = 0
+        self._miss_cursor.clear()
+
+    def advance(self, t):
+        """
+        t까지 SIM_DT 간격으로 auto_miss_check를 진행.
+        프레임레이트와 상관없이 같은 시각들에서 검사하므로 판정 결과가 결정적이고,
+        입력은 그 시각까지 진행한 뒤에 판정한다.
+        """
+        while (self.sim_step + 1) * SIM_DT <= t:
+            self.sim_step += 1
+            self.auto_miss_check(self.sim_step * SIM_DT)
+
+    def apply_judgement(self, name, track, note, t):
+        self._touched.append(note)
+        self.counts[name] += 1
+        if name == "Miss":
+            self.combo = 0
+        else:
+            self.combo += 1
+            self.max_combo = max(self.max_combo, self.combo)
+        if self.on_judgement:
+            self.on_judgement(name, track, note, t)
+
+    # 안정적으로 가장 가까운 아직 판정되지 않은 non-hold 노트 찾기
+    def find_nearest_nonhold(self, track, t):
+        best = None
+        best_d = None
+        notes = self.notes_by_track.get(track, [])
+        # 검색: 현재 시간 기준으로 전후로 가까운 노트 선택
+        for n in notes:
+            if n["hold"] or n["hit"] or n["missed"]:
+                continue
+            d = abs(time_error_ms(n, t))
+            if best_d is None or d < best_d:
+                best_d = d
+                best = n
+        return best, best_d
+
+    def do_judge(self, track, t):
+        n, d = self.find_nearest_nonhold(track, t)
+        if not n:
+            return None
+        if d <= MISS_THRESHOLD_MS and self.stats is not None:
+            self.stats.add(time_error_ms(n, t))
+        # 판정
+        for name, ms in J_WINDOWS:
+            if d <= ms:
+                n["hit"] = True
+                self.apply_judgement(name, track, n, t)
+                return name
+        if d <= MISS_THRESHOLD_MS:
+            n["hit"] = True
+            self.apply_judgement("Bad", track, n, t)
+            return "Bad"
+        return None
+
+    def press(self, track, t):
+        # First, try to find matching hold note to start holding.
+        for n in self.notes_by_track.get(track, []):
+            if n["hold"] and not n["hit"] and not n["missed"] and not n["holding"]:
+                # allow leeway: within MISS_THRESHOLD_MS before/after start
+                if abs(time_error_ms(n, t)) <= MISS_THRESHOLD_MS:
+                    n["holding"] = True
+                    self._touched.append(n)
+                    if self.stats is not None:
+                        self.stats.add(time_error_ms(n, t))
+                    # mark as not yet hit - final judgement done on release or end
+                    return None
+        # judge instantaneous note
+        return self.do_judge(track, t)
+
+    def release(self, track, t):
+        # evaluate hold release
+        for n in self.notes_by_track.get(track, []):
+            if n["hold"] and n.get("holding", False) and not n["hit"] and not n["missed"]:
+                # if released within 0.5s before end => success (Perfect)
+                # i.e., if end - t <= 0.5 -> Perfect
+                if n["e"] - t <= 0.5:
+                    n["hit"] = True
+                    n["held_success"] = True
+                    n["holding"] = False
+                    self.apply_judgement("Perfect", track, n, t)
+                    return "Perfect"
+                # too early release -> Miss (추가)
+                n["missed"] = True
+                n["holding"] = False
+                self.apply_judgement("Miss", track, n, t)
+                return "Miss"
+        return None
+
+    # auto miss checker for allowed MISS_TRACKS only
+    # 커서 이전은 모두 판정됨, s가 한계를 넘으면 이후 노트도 아직 대상 아님 (s 정렬, e >= s)
+    def auto_miss_check(self, t):
+        limit = t - MISS_THRESHOLD_MS / 1000.0
+        for tr in self.miss_tracks:
+            notes = self.notes_by_track.get(tr)
+            if not notes:
+                continue
+            i = self._miss_cursor.get(tr, 0)
+            while i < len(notes) and (notes[i]["hit"] or notes[i]["missed"]):
+                i += 1
+            self._miss_cursor[tr] = i
+            for j in range(i, len(notes)):
+                n = notes[j]
+                if n["s"] >= limit:
+                    break
+                if n["hit"] or n["missed"]:
+                    continue
+                if not n["hold"]:
+                    # non-hold: 지나가면 miss
+                    if t - n["s"] > MISS_THRESHOLD_MS / 1000.0:
+                        n["missed"] = True
+                        self.apply_judgement("Miss", tr, n, t)
+                else:
+                    # hold: 만약 끝나고 일정 시간 지났으면 finalize
+                    if t - n["e"] > MISS_THRESHOLD_MS / 1000.0:
+                        if n.get("held_success", False) or n.get("holding", False):
+                            n["hit"] = True
+                            n["holding"] = False
+                            self.apply_judgement("Perfect", tr, n, t)
+                        else:
+                            # not held correctly
+                            n["hit"] = True
+                            n["missed"] = True
+                            n["holding"] = False
+                            self.apply_judgement("Miss", tr, n, t)
+
+# ---------------- 오토플레이 ----------------
+def autoplay_events(notes_by_track, tracks):
+    """
+    완벽한 가상 플레이어의 입력 목록 [(t, "press"/"release", track)].
+    단노트는 s에 눌렀다 떼고, 롱노트는 s에 눌러 e에 뗀다.
+    같은 시각의 이벤트는 트랙 내 생성 순서를 유지 (stable sort).
+    """
+    events = []
+    for tr in tracks:
+        for n in notes_by_track.get(tr, []):
+            events.append((n["s"], "press", tr))
+            events.append((n["e"], "release", tr))
+    events.sort(key=lambda ev: ev[0])
+    return events
+
+# ---------------- 세션 텔레메트리 ----------------
+TEL_JUDGEMENT, TEL_COMBO_BREAK, TEL_PAUSE, TEL_RESUME, TEL_RESTART = range(5)
+TEL_KIND_NAMES = ("judgement", "combo_break", "pause", "resume", "restart")
+TEL_RESULTS = [name for name, _ in J_WINDOWS] + ["Miss"]
+TEL_NO_RESULT = 255
+TEL_NO_TRACK = 255
+
+# 고정 크기 레코드: kind, track, result, combo, note_s, press_s, error_ms
+TEL_RECORD = struct.Struct("<BBBIddf")
+TEL_COLUMNS = (("kind", "B"), ("track", "B"), ("result", "B"), ("combo", "I"),
+               ("note_s", "d"), ("press_s", "d"), ("error_ms", "f"))
+TEL_MAGIC = b"DPCTEL1\n"
+TEL_TRAILER = 0xFFFFFFFF  # 블록 레코드 수 자리에 오면 마지막 trailer (u32 길이 + JSON, 예: dropped)
+
+class TelemetryRecorder:
+    """
+    메인 스레드는 미리 할당된 링 버퍼에 고정 크기 레코드를 pack_into만 하고,
+    백그라운드 스레드가 TELEMETRY_FLUSH_S마다 쌓인 만큼 묶어서 파일에 쓴다.
+    생산자/소비자가 하나씩이라 잠금 없이 head/tail 카운터만 사용.
+    버퍼가 가득 차면 기록을 버리고 dropped를 센다 (입력 경로를 절대 막지 않음).
+    파일은 첫 flush 때 writer 스레드에서 만든다: 생성자는 디스크를 건드리지 않고,
+    아무것도 기록하지 않은 세션은 파일을 남기지 않는다. dropped는 끝에 trailer로 기록.
+    """
+    def __init__(self, path, header, fmt=TELEMETRY_FORMAT, capacity=TELEMETRY_RING_RECORDS):
+        self.path = path
+        self.header = header
+        self.fmt = fmt
+        self.capacity = capacity
+        self.buf = bytearray(TEL_RECORD.size * capacity)
+        self.head = 0     # 쓴 레코드 수 (메인 스레드만 증가)
+        self.tail = 0     # 파일로 내보낸 레코드 수 (writer 스레드만 증가)
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._file = None
+        self._failed = False
+        self._thread = threading.Thread(target=self._run, name="dpc-telemetry", daemon=True)
+        self._thread.start()
+
+    # ---- 메인 스레드 ----
+    def record(self, kind, track=TEL_NO_TRACK, result=TEL_NO_RESULT, combo=0, note_s=0.0, press_s=0.0, error_ms=0.0):
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return
+        TEL_RECORD.pack_into(self.buf, (head % self.capacity) * TEL_RECORD.size,
+                             kind, track, result, combo, note_s, press_s, error_ms)
+        self.head = head + 1
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._flush()
+        if self._file is not None:
+            self._write_trailer({"dropped": self.dropped})
+            self._file.close()
+
+    # ---- writer 스레드 ----
+    def _run(self):
+        while not self._stop.wait(TELEMETRY_FLUSH_S):
+            self._flush()
+
+    def _open(self):
+        if self._file is None and not self._failed:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # "x": 같은 이름이 이미 있으면 (다른 세션이 아직 쓰는 중일 수 있음) 덮어쓰지 않고 실패
+                if self.fmt == "columnar":
+                    self._file = open(self.path, "xb")
+                else:
+                    self._file = open(self.path, "x", encoding="utf-8")
+                self._write_header(self.header)
+            except OSError as e:
+                print("텔레메트리 파일 생성 실패:", e)
+                self._failed = True
+        return self._file is not None
+
+    def _flush(self):
+        head, tail = self.head, self.tail
+        if head == tail:
+            return
+        if not self._open():
+            self.tail = head  # 쓸 곳이 없으면 버린다
+            return
+        size = TEL_RECORD.size
+        a = (tail % self.capacity) * size
+        b = (head % self.capacity) * size
+        if a < b:
+            chunk = bytes(self.buf[a:b])
+        else:
+            chunk = bytes(self.buf[a:]) + bytes(self.buf[:b])
+        self.tail = head
+        rows = list(TEL_RECORD.iter_unpack(chunk))
+        if self.fmt == "columnar":
+            self._write_block(rows)
+        else:
+            for row in rows:
+                rec = dict(zip((name for name, _ in TEL_COLUMNS), row))
+                rec["kind"] = TEL_KIND_NAMES[rec["kind"]]
+                rec["result"] = TEL_RESULTS[rec["result"]] if rec["result"] != TEL_NO_RESULT else None
+                rec["track"] = rec["track"] if rec["track"] != TEL_NO_TRACK else None
+                self._file.write(json.dumps(rec) + "\n")
+        self._file.flush()
+
+    def _write_header(self, header):
+        header = dict(header, columns=TEL_COLUMNS, kinds=TEL_KIND_NAMES, results=TEL_RESULTS,
+                      byteorder=sys.byteorder)
+        if self.fmt == "columnar":
+            data = json.dumps(header).encode("utf-8")
+            self._file.write(TEL_MAGIC + struct.pack("<I", len(data)) + data)
+        else:
+            self._file.write(json.dumps(header) + "\n")
+
+    def _write_block(self, rows):
+        # 블록: 레코드 수(u32) + 열마다 연속 배열
+        cols = list(zip(*rows))
+        parts = [struct.pack("<I", len(rows))]
+        for (name, code), values in zip(TEL_COLUMNS, cols):
+            parts.append(array(code, values).tobytes())
+        self._file.write(b"".join(parts))
+
+    def _write_trailer(self, trailer):
+        if self.fmt == "columnar":
+            data = json.dumps(trailer).encode("utf-8")
+            self._file.write(struct.pack("<II", TEL_TRAILER, len(data)) + data)
+        else:
+            self._file.write(json.dumps(trailer) + "\n")
+
+def read_telemetry(path):
+    """columnar 세션 파일 -> (header, {열 이름: array}). trailer 항목(dropped)은 header에 합친다"""
+    with open(path, "rb") as f:
+        if f.read(len(TEL_MAGIC)) != TEL_MAGIC:
+            raise ValueError(f"텔레메트리 파일이 아닙니다: {path}")
+        (hlen,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(hlen).decode("utf-8"))
+        columns = {name: array(code) for name, code in TEL_COLUMNS}
+        while True:
+            raw = f.read(4)
+            if len(raw) < 4:
+                break
+            (count,) = struct.unpack("<I", raw)
+            if count == TEL_TRAILER:
+                (tlen,) = struct.unpack("<I", f.read(4))
+                header.update(json.loads(f.read(tlen).decode("utf-8")))
+                break
+            for name, code in TEL_COLUMNS:
+                col = array(code)
+                col.frombytes(f.read(col.itemsize * count))
+                if header.get("byteorder", sys.byteorder) != sys.byteorder:
+                    col.byteswap()
+                columns[name].extend(col)
+    return header, columns
+
+def open_session_telemetry(chart_name, mode, offset_ms):
+    if not TELEMETRY_ENABLED:
+        return None
+    # 밀리초까지: 제자리 전환(A->B->A)으로 같은 채보/모드 세션이 1초 안에 다시 열릴 수 있다
+    now = time.time()
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now)) + f"_{int(now * 1000) % 1000:03d}"
+    ext = "dpctel" if TELEMETRY_FORMAT == "columnar" else "jsonl"
+    path = os.path.join(TELEMETRY_DIR, f"{os.path.splitext(chart_name)[0]}_{mode}k_{stamp}.{ext}")
+    header = {"chart": chart_name, "mode": mode, "started": stamp,
+              "machine": machine_id(), "offset_ms": offset_ms}
+    return TelemetryRecorder(path, header)
+
+# ---------------- 창 / 프레임 페이싱 ----------------
+def measure_flip_wait(screen, flips=VSYNC_PROBE_FLIPS):
+    """
+    빈 화면을 여러 번 flip해서 (간격, 그중 CPU를 쓰지 않고 기다린 시간)의 중간값(초).
+    소프트웨어 렌더러는 flip 자체가 느릴 수 있으므로 간격만으로는 vsync를 판단하지 않는다
+    """
+    screen.fill((0, 0, 0))
+    intervals, waits = [], []
+    last, cpu_last = time.perf_counter(), time.thread_time()
+    for _ in range(flips):
+        pygame.display.flip()
+        now, cpu_now = time.perf_counter(), time.thread_time()
+        intervals.append(now - last)
+        waits.append((now - last) - (cpu_now - cpu_last))
+        last, cpu_last = now, cpu_now
+    intervals.sort()
+    waits.sort()
+    return intervals[flips // 2], waits[flips // 2]
+
+def open_window(w, h):
+    """
+    (screen, vsync_hz). VSYNC이면 SCALED 렌더러 + vsync를 시도하고, vsync는 무시될 수 있는
+    힌트라서 flip이 실제로 잠들어 기다리는지 재서 확인된 경우에만 쓴다 (vsync_hz = 측정한 주사율).
+    아니면 일반 RESIZABLE 창, vsync_hz = None (드라이버가 vsync를 바쁜 대기로 하면 이쪽).
+    """
+    if VSYNC:
+        try:
+            screen = pygame.display.set_mode((w, h), pygame.RESIZABLE | pygame.SCALED, vsync=1)
+            interval, wait = measure_flip_wait(screen)
+            if wait >= VSYNC_MIN_WAIT_S:
+                return screen, 1.0 / interval
+            print(f"vsync가 적용되지 않음 (flip {interval * 1000:.2f} ms, 대기 {wait * 1000:.2f} ms), 일반 창 사용")
+        except pygame.error:
+            pass
+    return pygame.display.set_mode((w, h), pygame.RESIZABLE), None
+
+class _SDLDisplayMode(ctypes.Structure):
+    _fields_ = [("format", ctypes.c_uint32), ("w", ctypes.c_int), ("h", ctypes.c_int),
+                ("refresh_rate", ctypes.c_int), ("driverdata", ctypes.c_void_p)]
+
+def _sdl_library():
+    """pygame이 올린 SDL2 공유 라이브러리 (휠에 함께 들어 있는 것 우선). 못 찾으면 None"""
+    base = os.path.dirname(pygame.__file__)
+    candidates = (glob.glob(os.path.join(base, "SDL2.dll"))                      # Windows 휠
+                  + glob.glob(os.path.join(base + ".libs", "libSDL2-*.so*"))     # Linux 휠
+                  + glob.glob(os.path.join(base, ".dylibs", "libSDL2-*.dylib"))  # macOS 휠
+                  + [p for p in [ctypes.util.find_library("SDL2")] if p])        # 시스템 SDL2로 빌드한 경우
+    for path in candidates:
+        try:
+            return ctypes.CDLL(path)
+        except OSError:
+            continue
+    return None
+
+def display_refresh_rate():
+    """데스크톱 주사율, 디스플레이가 여럿이면 가장 높은 값 (알 수 없으면 FPS)"""
+    get_rates = getattr(pygame.display, "get_desktop_refresh_rates", None)  # pygame-ce
+    if get_rates is not None:
+        try:
+            rates = [r for r in get_rates() if r]
+            if rates:
+                return max(rates)
+        except pygame.error:
+            pass
+    # pygame 2.x에는 주사율 API가 없어서 같은 SDL에 직접 묻는다 (초기화 안 된 다른 SDL이면 실패 -> FPS).
+    # pygame._sdl2의 Window.from_display_module()은 해제될 때 창을 망가뜨릴 수 있어 쓰지 않는다
+    lib = _sdl_library()
+    if lib is not None:
+        mode = _SDLDisplayMode()
+        rates = []
+        try:
+            for i in range(max(0, lib.SDL_GetNumVideoDisplays())):
+                if lib.SDL_GetDesktopDisplayMode(i, ctypes.byref(mode)) == 0 and mode.refresh_rate > 0:
+                    rates.append(mode.refresh_rate)
+        except (AttributeError, OSError):
+            pass
+        if rates:
+            return max(rates)
+    return FPS
+
+def frame_cap(vsync_hz):
+    """
+    clock.tick에 넘길 프레임 상한 (0 = 제한 없음).
+    vsync가 확인됐으면 flip이 페이싱하고 상한은 안전장치로만 (주사율 x VSYNC_GUARD)
+    """
+    if RENDER_FPS is not None:
+        return RENDER_FPS
+    if vsync_hz:
+        return int(vsync_hz * VSYNC_GUARD)
+    return display_refresh_rate()
+
 # ---------------- 메인 뷰어 ----------------
-def run_viewer(xml_path, mode):
-    notes_by_track = load_notes_from_xml(xml_path)
+def run_viewer(xml_path, mode, calibrate=False, export=None):
+    """
+    export가 주어지면 창/오디오/clock.tick 없이 오프스크린 Surface에
+    고정 시간 간격으로 그려서 export["sink"](frame, surface)로 넘긴다.
+      start, end: 프레임 범위 [start, end)
+      fps, size: 내보내기 프레임레이트 / (w, h)
+      autoplay: True면 완벽한 오토플레이 입력으로 판정/키빔 표시
+    """
     lane_tracks, KEY_TO_TRACK, side_len_lanes, MISS_TRACKS = build_mode_mapping(mode)
+    if calibrate:
+        # 보정 모드: 가운데 레인 하나에 메트로놈, 모든 키를 그 트랙으로
+        calib_track = lane_tracks[len(lane_tracks) // 2]
+        notes_by_track = build_metronome_chart(calib_track)
+        KEY_TO_TRACK = {k: calib_track for k in KEY_TO_TRACK}
+        chart_name = "calibration"
+        input_offset_ms = 0.0  # 보정 중에는 원시 오차를 측정
+    elif export is not None:
+        notes_by_track = load_notes_from_xml(xml_path)
+        chart_name = os.path.basename(xml_path)
+        input_offset_ms = 0.0
+    else:
+        # 채보는 백그라운드에서 로드, 그동안은 빈 채보로 로딩 화면 표시
+        notes_by_track = defaultdict(list)
+        chart_name = os.path.basename(xml_path)
+        input_offset_ms = 0.0  # 저장된 보정값은 로더에서 읽어서 도착하면 적용
 
     pygame.init()
-    SCREEN_W, SCREEN_H = 1280, 820
-    screen = pygame.display.set_mode((SCREEN_W, SCREEN_H), pygame.RESIZABLE)
-    pygame.display.set_caption(f"Chart Viewer - {mode}키 - {os.path.basename(xml_path)}")
+    if export is not None:
+        SCREEN_W, SCREEN_H = export.get("size", WINDOW_SIZE)
+        screen = pygame.Surface((SCREEN_W, SCREEN_H))
+        vsync_hz = None
+        vsync_active = False
+    else:
+        SCREEN_W, SCREEN_H = WINDOW_SIZE
+        screen, vsync_hz = open_window(SCREEN_W, SCREEN_H)
+        vsync_active = vsync_hz is not None
+        pygame.display.set_caption(f"Chart Viewer - {mode}키 - {chart_name}")
     clock = pygame.time.Clock()
 
-    # 오디오 시도 로드 (xml 폴더의 audio.ogg)
+    # 오디오 시도 로드 (xml 폴더의 audio.ogg, 보정 모드는 클릭 트랙)
     audio_loaded = False
-    audio_path = os.path.join(os.path.dirname(xml_path), DEFAULT_AUDIO_NAME)
+    click_sound = None
+    click_channel = None
     try:
-        if os.path.exists(audio_path):
+        if export is not None:
+            pass  # 내보내기는 영상만 (오디오는 인코더에서 합침)
+        elif calibrate:
             pygame.mixer.init()
-            pygame.mixer.music.load(audio_path)
-            audio_loaded = True
+            click_sound = build_metronome_sound()
+            audio_loaded = click_sound is not None
     except Exception as e:
         print("오디오 로드 실패:", e)
         audio_loaded = False
 
+    # 백그라운드 로딩: XML 파싱/정렬/변환과 오디오 열기를 각각 다른 워커에서.
+    # 보정값/노트 스킨도 (네트워크) 디스크를 읽으므로 첫 프레임 전에 메인 스레드에서 읽지 않는다
+    load_progress = {"chart": "ready", "audio": "none", "settings": "ready"}
+    loader = None
+    chart_cache = None
+    chart_future = None
+    pending_chart = None  # (path, mode): chart_future 완료 시 적용
+    audio_future = None
+    offset_future = None
+    skin_future = None
+    if export is None:
+        loader = DaemonPool(2)
+    if export is None and not calibrate:
+        load_progress["chart"] = "queued"
+        chart_cache = ChartCache()
+        chart_future = loader.submit(chart_cache.load, xml_path, load_progress)
+        pending_chart = (xml_path, mode)
+        try:
+            pygame.mixer.init()
+            load_progress["audio"] = "queued"
+            # audio.ogg가 없으면 load_audio가 "none"으로 표시 (존재 확인도 로더에서)
+            audio_future = loader.submit(load_audio, os.path.join(os.path.dirname(xml_path), DEFAULT_AUDIO_NAME), load_progress)
+        except Exception as e:
+            print("오디오 로드 실패:", e)
+        offset_future = loader.submit(load_calibration_offset)
+    if export is None and xml_path:
+        skin_future = loader.submit(load_note_skin, os.path.join(os.path.dirname(xml_path), DEFAULT_SKIN_NAME))
+    if offset_future is not None or skin_future is not None:
+        load_progress["settings"] = "queued"
+
+    def audio_play():
+        nonlocal click_channel
+        if not audio_loaded:
+            return
+        try:
+            if click_sound is not None:
+                click_channel = click_sound.play()
+            else:
+                pygame.mixer.music.play()
+        except:
+            pass
+
+    def audio_pause():
+        if not audio_loaded:
+            return
+        try:
+            if click_channel is not None:
+                click_channel.pause()
+            else:
+                pygame.mixer.music.pause()
+        except:
+            pass
+
+    def audio_unpause():
+        if not audio_loaded:
+            return
+        try:
+            if click_channel is not None:
+                click_channel.unpause()
+            else:
+                pygame.mixer.music.unpause()
+        except:
+            pass
+
+    def audio_stop():
+        if not audio_loaded:
+            return
+        try:
+            if click_sound is not None:
+                click_sound.stop()
+            else:
+                pygame.mixer.music.stop()
+        except:
+            pass
+
     # 색상/폰트
     WHITE = (255, 255, 255)
     BLUE = (60, 130, 220)
@@ -235,8 +1267,6 @@ def run_viewer(xml_path, mode):
     font_mid = pygame.font.SysFont(None, 28)
     font_large = pygame.font.SysFont(None, 64)
 
-    MARGIN_X, MARGIN_BOTTOM, LANE_GAP = 60, 140, 8
-
     def compute_layout(w, h):
         usable = int((w - 2 * MARGIN_X) * 0.7)
         left = MARGIN_X + (w - 2 * MARGIN_X - usable) // 2
@@ -248,9 +1278,6 @@ def run_viewer(xml_path, mode):
     lanes, TARGET_Y = compute_layout(SCREEN_W, SCREEN_H)
 
     # 게임 상태
-    judgement_counts = {k: 0 for k, _ in J_WINDOWS}
-    judgement_counts["Miss"] = 0
-    combo = 0
     last_judgement = None
     last_judgement_time = 0.0
 
@@ -264,25 +1291,67 @@ def run_viewer(xml_path, mode):
     note_speed_mm = NOTE_SPEED_MM_PER_S
     btn_thickness_mm = BTN_THICKNESS_MM
 
+    # 타이밍 통계 (보정 모드에서는 오프셋 계산, 일반 플레이에서는 분포 표시)
+    timing_stats = TimingStats()
+    calib_result = None  # 보정 완료 메시지
+
+    # 세션 텔레메트리 (내보내기는 기록하지 않음). 일반 플레이는 보정값이 도착하면 연다 (헤더에 기록)
+    telemetry = open_session_telemetry(chart_name, mode, input_offset_ms) if export is None and offset_future is None else None
+    shown_combo = 0
+
+    # 오토플레이 없는 내보내기는 입력이 없으므로 판정 자체를 하지 않는다 (자동 miss로 도배 방지)
+    judging = export is None or bool(export.get("autoplay"))
+
+    # 판정 팝업 시계: 라이브는 실제 시간 (일시정지 중에도 사라지게), 내보내기는 채보 시간
+    def popup_clock(t):
+        return t if export is not None else time.time()
+
+    def on_judgement(name, track, note, t):
+        nonlocal last_judgement, last_judgement_time, shown_combo
+        last_judgement = name
+        last_judgement_time = popup_clock(t)
+        if telemetry is not None:
+            telemetry.record(TEL_JUDGEMENT, track, TEL_RESULTS.index(name), engine.combo,
+                             note["s"], t, time_error_ms(note, t))
+            if name == "Miss" and shown_combo > 0:
+                telemetry.record(TEL_COMBO_BREAK, track, TEL_RESULTS.index(name), shown_combo, note["s"], t)
+        shown_combo = engine.combo
+
+    engine = JudgeEngine(notes_by_track, MISS_TRACKS, stats=timing_stats, on_judgement=on_judgement)
+    judgement_counts = engine.counts
+
     # time helper
-    def now_seconds():
+    def clock_seconds():
+        # 보정 전 원시 시계 (일시정지/재개 기준)
         if paused:
             return pause_time
         else:
             return time.time() - start_time
 
-    # 초기화
-    def reset_all_notes():
-        for notes in notes_by_track.values():
-            for n in notes:
-                n.update({"hit": False, "missed": False, "holding": False, "held_success": False})
+    def now_seconds():
+        # 채보 시간: 기기별 지연 오프셋 적용 (양수 = 입력/오디오가 늦음)
+        return clock_seconds() - input_offset_ms / 1000.0
+
+    def input_seconds(ev):
+        """
+        키 이벤트의 채보 시각. pygame-ce는 SDL 이벤트 시각(ev.timestamp, get_ticks 기준 ms)을 주므로
+        이벤트 큐를 읽을 때까지 기다린 만큼 되돌린다. pygame 2.x 이벤트에는 시각이 없어서
+        입력은 큐를 읽는 시각, 즉 렌더링 주기로 샘플링된다 (오차 최대 한 프레임, 60Hz면 ~16ms).
+        """
+        now = now_seconds()
+        stamp = getattr(ev, "timestamp", 0)
+        if not stamp or paused:
+            return now
+        # 이전 프레임 이전일 수는 없다 (그랬다면 그 프레임에서 읽었을 것)
+        return min(now, max(last_frame_t, now - max(0, pygame.time.get_ticks() - stamp) / 1000.0))
 
+    # 초기화
     def reset_game():
-        nonlocal combo, last_judgement, last_judgement_time, pressed_tracks, pressed_physical_keys, paused, start_time, pause_time, note_speed_mm, btn_thickness_mm
-        reset_all_notes()
-        for k in judgement_counts:
-            judgement_counts[k] = 0
-        combo = 0
+        nonlocal shown_combo, last_judgement, last_judgement_time, pressed_tracks, pressed_physical_keys, paused, start_time, pause_time, note_speed_mm, btn_thickness_mm, calib_result
+        engine.reset()
+        shown_combo = 0
+        timing_stats.reset()
+        calib_result = None
         last_judgement = None
         last_judgement_time = 0.0
         pressed_tracks.clear()
@@ -292,11 +1361,7 @@ def run_viewer(xml_path, mode):
         pause_time = 0.0
         note_speed_mm = NOTE_SPEED_MM_PER_S
         btn_thickness_mm = BTN_THICKNESS_MM
-        if audio_loaded:
-            try:
-                pygame.mixer.music.stop()
-            except:
-                pass
+        audio_stop()
 
     reset_game()
 
@@ -307,128 +1372,99 @@ def run_viewer(xml_path, mode):
     def trigger_th_px():
         return max(1, int((btn_thickness_mm - 0.5) * PIXELS_PER_MM))
 
-    # judgement helpers
-    def apply_judgement(name):
-        nonlocal combo, last_judgement, last_judgement_time
-        if name == "Miss":
-            combo = 0
-        else:
-            combo += 1
-        last_judgement = name
-        last_judgement_time = time.time()
-
-    def time_error_ms(note, t):
-        return (t - note["s"]) * 1000.0
+    # 화면 컬링 인덱스 (채보가 바뀔 때 다시 만든다)
+    note_index = build_note_index(notes_by_track)
 
-    # 안정적으로 가장 가까운 아직 판정되지 않은 non-hold 노트 찾기
-    def find_nearest_nonhold(track, t):
-        best = None
-        best_d = None
-        notes = notes_by_track.get(track, [])
-        # 검색: 현재 시간 기준으로 전후로 가까운 노트 선택
-        for n in notes:
-            if n["hold"] or n["hit"] or n["missed"]:
-                continue
-            d = abs(time_error_ms(n, t))
-            if best_d is None or d < best_d:
-                best_d = d
-                best = n
-        return best, best_d
+    # 노트 아틀라스: 레인 폭/두께/화면 높이가 바뀔 때만 다시 만든다
+    # 라이브는 로더가 읽어 오면 교체 (그 전에는 단색)
+    note_skin = load_note_skin(os.path.join(os.path.dirname(xml_path), DEFAULT_SKIN_NAME)) if export is not None and xml_path else None
+    note_colors = {"lane": WHITE, "lane_blue": BLUE, "side": TEAL, "trigger": RED}
+    note_atlas = None
+    atlas_cells = None
+    atlas_key = None
 
-    def do_judge(track, t):
-        n, d = find_nearest_nonhold(track, t)
-        if not n:
-            return None
-        # 판정
-        for name, ms in J_WINDOWS:
-            if d <= ms:
-                n["hit"] = True
-                judgement_counts[name] += 1
-                apply_judgement(name)
-                return name
-        if d <= MISS_THRESHOLD_MS:
-            n["hit"] = True
-            judgement_counts["Bad"] += 1
-            apply_judgement("Bad")
-            return "Bad"
-        return None
-
-    # auto miss checker for allowed MISS_TRACKS only
-    def auto_miss_check(t):
-        for tr in MISS_TRACKS:
-            for n in notes_by_track.get(tr, []):
-                if n["hit"] or n["missed"]:
-                    continue
-                if not n["hold"]:
-                    # non-hold: 지나가면 miss
-                    if t - n["s"] > MISS_THRESHOLD_MS / 1000.0:
-                        n["missed"] = True
-                        judgement_counts["Miss"] += 1
-                        apply_judgement("Miss")
-                else:
-                    # hold: 만약 끝나고 일정 시간 지났으면 finalize
-                    if t - n["e"] > MISS_THRESHOLD_MS / 1000.0:
-                        if n.get("held_success", False) or n.get("holding", False):
-                            if not n["hit"]:
-                                judgement_counts["Perfect"] += 1
-                                apply_judgement("Perfect")
-                                n["hit"] = True
-                                n["holding"] = False
-                        else:
-                            # not held correctly
-                            judgement_counts["Miss"] += 1
-                            apply_judgement("Miss")
-                            n["hit"] = True
-                            n["missed"] = True
-                            n["holding"] = False
-
-    # 노트 보이기 규칙: hold이면 end까지 + buffer로 보여줘야 함
-    def should_show(n, t):
-        if n["hold"]:
-            return t <= n["e"] + 1.0  # buffer 1s
-        return not n["hit"] and not n["missed"]
+    def side_width_px():
+        # side/trigger 넓이 계산 (lane 단위로)
+        if not lanes:
+            return 0
+        return int(side_len_lanes * (lanes[0][1] + LANE_GAP) - LANE_GAP)
+
+    def ensure_atlas():
+        nonlocal note_atlas, atlas_cells, atlas_key
+        note_w = max(1, int(lanes[0][1] * 0.9))
+        side_w = max(1, side_width_px())
+        key = (note_w, side_w, normal_th_px(), trigger_th_px(), SCREEN_H)
+        if key == atlas_key:
+            return
+        sizes = {
+            "lane": (note_w, normal_th_px()),
+            "lane_blue": (note_w, normal_th_px()),
+            "side": (side_w, trigger_th_px()),
+            "trigger": (side_w, trigger_th_px()),
+        }
+        note_atlas, atlas_cells = build_note_atlas(sizes, note_colors, SCREEN_H, note_skin)
+        atlas_key = key
 
-    # 노트 그리기
+    # 노트 그리기: 보이는 노트를 (아틀라스, 위치, 원본 rect)로 모아서 blits 한 번
     def draw_notes(t):
-        # side/trigger 넓이 계산 (lane 단위로)
-        if lanes:
-            lane_w = lanes[0][1]
-            gap = LANE_GAP
-            side_width_px = int(side_len_lanes * (lane_w + gap) - gap)
-        else:
-            side_width_px = 0
+        ensure_atlas()
+        # 노트 y는 (s - t) * 속도 * px/mm 순서로 계산 (px_per_s를 미리 곱하면 반올림이 달라져 가끔 한 줄 어긋남)
+        px_per_s = note_speed_mm * PIXELS_PER_MM
+        batch = []
+        # 화면 안에 들어올 수 있는 시간 구간만 이분 탐색으로 골라서 본다
+        t_lo, t_hi = cull_window(t, px_per_s, SCREEN_H, TARGET_Y, normal_th_px() + trigger_th_px())
+
+        def add_head(kind, x, top):
+            cx, cw, head_h, period = atlas_cells[kind]
+            if top >= SCREEN_H or top + head_h <= 0:
+                return
+            batch.append((note_atlas, (x, top), (cx, 0, cw, head_h)))
+
+        def add_body(kind, x, top, h):
+            # 화면 밖 부분은 잘라내고, 타일 스킨은 노트와 같이 흐르도록 오프셋
+            cx, cw, head_h, period = atlas_cells[kind]
+            vis_top = max(top, 0)
+            vis_bottom = min(top + h, SCREEN_H)
+            if vis_bottom <= vis_top:
+                return
+            off = (vis_top - top) % period
+            batch.append((note_atlas, (x, vis_top), (cx, head_h + off, cw, vis_bottom - vis_top)))
 
         # 사이드/트리거 먼저
-        for tr, color, left_side in [(LS_TRACK, TEAL, True), (RS_TRACK, TEAL, False), (TL_TRACK, RED, True), (TR_TRACK, RED, False)]:
-            for n in notes_by_track.get(tr, []):
-                if not should_show(n, t): continue
-                if left_side:
-                    x_start = lanes[0][0]
-                    x_end = x_start + side_width_px
-                else:
-                    x_end = lanes[-1][0] + lanes[-1][1]
-                    x_start = x_end - side_width_px
+        side_w = side_width_px()
+        for tr, kind, left_side in [(LS_TRACK, "side", True), (RS_TRACK, "side", False), (TL_TRACK, "trigger", True), (TR_TRACK, "trigger", False)]:
+            if left_side:
+                x_start = lanes[0][0]
+            else:
+                x_start = lanes[-1][0] + lanes[-1][1] - side_w
+            for n in visible_notes(notes_by_track, note_index, tr, t_lo, t_hi, t):
                 y1 = TARGET_Y - (n["s"] - t) * note_speed_mm * PIXELS_PER_MM
                 y2 = TARGET_Y - (n["e"] - t) * note_speed_mm * PIXELS_PER_MM
-                rect = pygame.Rect(x_start, min(y1, y2), x_end - x_start, max(trigger_th_px(), abs(int(y2 - y1))))
-                pygame.draw.rect(screen, color, rect)
+                h = abs(int(y2 - y1))
+                if h > trigger_th_px():
+                    add_body(kind, x_start, int(min(y1, y2)), h)
+                else:
+                    add_head(kind, x_start, int(min(y1, y2)))
 
         # 버튼 레인 노트
         for i, tr in enumerate(lane_tracks):
             x, w = lanes[i]
-            for n in notes_by_track.get(tr, []):
-                if not should_show(n, t): continue
+            x += int(w * 0.05)
+            # 요청: 2번과 5번 레인을 파란색으로 (index 기준: lane_tracks index 1 and 4)
+            kind = "lane_blue" if i in (1, 4) and len(lane_tracks) >= 5 else "lane"
+            for n in visible_notes(notes_by_track, note_index, tr, t_lo, t_hi, t):
                 y = TARGET_Y - (n["s"] - t) * note_speed_mm * PIXELS_PER_MM
-                # 요청: 2번과 5번 레인을 파란색으로 (index 기준: lane_tracks index 1 and 4)
-                color = BLUE if i in (1, 4) and len(lane_tracks) >= 5 else WHITE
                 if n["hold"]:
                     y2 = TARGET_Y - (n["e"] - t) * note_speed_mm * PIXELS_PER_MM
-                    rect = pygame.Rect(x + int(w * 0.05), min(y, y2), int(w * 0.9), max(normal_th_px(), abs(int(y2 - y))))
-                    pygame.draw.rect(screen, color, rect)
+                    h = abs(int(y2 - y))
+                    if h > normal_th_px():
+                        add_body(kind, x, int(min(y, y2)), h)
+                    else:
+                        add_head(kind, x, int(min(y, y2)))
                 else:
-                    th = normal_th_px()
-                    rect = pygame.Rect(x + int(w * 0.05), int(y - th / 2), int(w * 0.9), th)
-                    pygame.draw.rect(screen, color, rect)
+                    add_head(kind, x, int(y - normal_th_px() / 2))
+
+        screen.blits(batch, doreturn=False)
 
     # 키빔 그리기: 판정선 아래 전체 채우기 + 판정선 위 5cm까지 페이드
     def draw_keybeams():
@@ -480,7 +1516,7 @@ def run_viewer(xml_path, mode):
         # special tracks
         lines.append(f"TL({TL_TRACK}):{('/'.join(inv.get(TL_TRACK,[])) or '-')}  TR({TR_TRACK}):{('/'.join(inv.get(TR_TRACK,[])) or '-')}")
         lines.append(f"LS({LS_TRACK}):{('/'.join(inv.get(LS_TRACK,[])) or '-')}  RS({RS_TRACK}):{('/'.join(inv.get(RS_TRACK,[])) or '-')}")
-        lines.append("Controls: P Start/Pause  1/- Speed  2/+ Speed  3/- Thick  4/+ Thick  9 Restart")
+        lines.append("Controls: P Start/Pause  1/- Speed  2/+ Speed  3/- Thick  4/+ Thick  9 Restart  [/] Chart  M Mode")
         return lines
 
     # lane label rendering
@@ -498,13 +1534,68 @@ def run_viewer(xml_path, mode):
         screen.blit(font_small.render("LS " + ("/".join(inv.get(LS_TRACK, [])) or "-"), True, TEXT), (lanes[0][0], TARGET_Y + 58))
         screen.blit(font_small.render("RS " + ("/".join(inv.get(RS_TRACK, [])) or "-"), True, TEXT), (lanes[-1][0] + lanes[-1][1] - 80, TARGET_Y + 58))
 
+    # 보정 완료 체크: 마지막 박 이후 결과 저장
+    def check_calibration_done(t):
+        nonlocal calib_result
+        if not calibrate or calib_result is not None:
+            return
+        last_s = max((n["s"] for notes in notes_by_track.values() for n in notes), default=0.0)
+        if t < last_s + MISS_THRESHOLD_MS / 1000.0 + 0.5:
+            return
+        if timing_stats.count < CALIB_MIN_SAMPLES:
+            calib_result = f"Calibration failed: {timing_stats.count} hits (need {CALIB_MIN_SAMPLES})  9 Retry"
+        elif save_calibration_offset(timing_stats):
+            calib_result = f"Offset saved: {timing_stats.mean:+.1f} ms (sd {timing_stats.std:.1f}, n={timing_stats.count})"
+        else:
+            calib_result = "Calibration save failed"
+
+    # early/late 분포 (히스토그램 + 평균/표준편차)
+    def draw_timing_hist(x, y, w, h):
+        pygame.draw.rect(screen, LANE_BG, (x, y, w, h))
+        hist = timing_stats.hist
+        peak = max(hist) or 1
+        bar_w = w / len(hist)
+        half = len(hist) // 2
+        for i, c in enumerate(hist):
+            if not c:
+                continue
+            bh = max(1, int((h - 4) * c / peak))
+            color = JUDGE_COLORS["Great"] if i < half else JUDGE_COLORS["Bad"]
+            pygame.draw.rect(screen, color, (int(x + i * bar_w), y + h - bh, max(1, int(bar_w) - 1), bh))
+        pygame.draw.line(screen, WHITE, (x + w // 2, y), (x + w // 2, y + h), 1)
+        if timing_stats.count:
+            label = f"{timing_stats.mean:+.1f}ms  sd {timing_stats.std:.1f}  n={timing_stats.count}"
+        else:
+            label = "early | late"
+        screen.blit(font_small.render(label, True, TEXT), (x, y + h + 2))
+
+    # 로딩 화면 (채보/오디오 준비 전)
+    def draw_loading():
+        lines = [
+            f"Loading {chart_name}",
+            f"Chart: {load_progress['chart']}",
+            f"Audio: {load_progress['audio']}",
+            f"Offset/Skin: {load_progress['settings']}",
+            "P start is enabled when all are ready",
+        ]
+        y = SCREEN_H // 3
+        for i, ln in enumerate(lines):
+            txt = (font_mid if i == 0 else font_small).render(ln, True, WHITE if i == 0 else TEXT)
+            screen.blit(txt, txt.get_rect(center=(SCREEN_W // 2, y)))
+            y += 34 if i == 0 else 22
+
     # HUD draw
     def draw_hud(t):
-        # top-left
+        # top-left (FPS/오디오/오프셋은 라이브 전용: 내보낸 영상에는 의미 없음)
         lines = [
             f"Time: {t:.2f}s   Speed: {note_speed_mm:.1f} mm/s   Thick: {btn_thickness_mm:.2f} mm",
-            f"Mode: {mode}키   File: {os.path.basename(xml_path)}  Audio: {'Yes' if audio_loaded else 'No'}"
+            f"Mode: {mode}키   File: {chart_name}"
         ]
+        if export is None:
+            lines[0] += f"   FPS: {clock.get_fps():.0f}{' (vsync)' if vsync_active else ''}"
+            lines[1] += f"  Audio: {'Yes' if audio_loaded else 'No'}   Offset: {input_offset_ms:+.1f} ms"
+            if load_progress["chart"].startswith("failed"):
+                lines.append(f"Chart load {load_progress['chart']}")
         y = 6
         for ln in lines:
             screen.blit(font_small.render(ln, True, TEXT), (10, y))
@@ -516,72 +1607,235 @@ def run_viewer(xml_path, mode):
             y += 16
 
         # judgement counts to the right
-        x_right = SCREEN_W - 200
-        yy = 8
-        for name in ["Perfect", "Great", "Good", "Bad", "Miss"]:
-            c = judgement_counts.get(name, 0)
-            screen.blit(font_small.render(f"{name}: {c}", True, JUDGE_COLORS.get(name, TEXT)), (x_right, yy))
-            yy += 18
+        if judging:
+            x_right = SCREEN_W - 200
+            yy = 8
+            for name in ["Perfect", "Great", "Good", "Bad", "Miss"]:
+                c = judgement_counts.get(name, 0)
+                screen.blit(font_small.render(f"{name}: {c}", True, JUDGE_COLORS.get(name, TEXT)), (x_right, yy))
+                yy += 18
+
+            # early/late 분포
+            draw_timing_hist(x_right, yy + 6, 180, 48)
 
         # combo big
-        if combo > 0:
-            txt = font_large.render(str(combo), True, WHITE)
+        if engine.combo > 0:
+            txt = font_large.render(str(engine.combo), True, WHITE)
             screen.blit(txt, txt.get_rect(center=(SCREEN_W // 2, SCREEN_H // 3)))
 
         # last judgement pop
-        if last_judgement and (time.time() - last_judgement_time < 0.9):
+        if last_judgement and (0.0 <= popup_clock(t) - last_judgement_time < 0.9):
             color = JUDGE_COLORS.get(last_judgement, WHITE)
             txt = font_large.render(last_judgement, True, color)
             screen.blit(txt, txt.get_rect(center=(SCREEN_W // 2, SCREEN_H // 2 + 80)))
 
+        # 보정 안내/결과
+        if calibrate:
+            msg = calib_result or "Calibration: press P, then hit any key on each click"
+            txt = font_mid.render(msg, True, WHITE)
+            screen.blit(txt, txt.get_rect(center=(SCREEN_W // 2, SCREEN_H // 4)))
+
+    # 한 프레임 그리기 (라이브/내보내기 공용)
+    def render(t):
+        screen.fill(BG)
+        # lanes background
+        for x, w in lanes:
+            pygame.draw.rect(screen, LANE_BG, (x, 0, w, SCREEN_H))
+            pygame.draw.line(screen, GRAY, (x, 0), (x, SCREEN_H), 1)
+
+        # draw notes
+        draw_notes(t)
+
+        # draw keybeams under/above judge line
+        draw_keybeams()
+
+        # judge line always on top: thick green
+        x1 = lanes[0][0] - 4
+        x2 = lanes[-1][0] + lanes[-1][1] + 4
+        pygame.draw.line(screen, GREEN, (x1, TARGET_Y), (x2, TARGET_Y), JUDGE_LINE_THICKNESS_PX)
+
+        # lane labels and HUD
+        draw_lane_labels()
+        draw_hud(t)
+
+    # ---------------- 오프라인 내보내기 ----------------
+    if export is not None:
+        fps = export.get("fps", FPS)
+        start_frame, end_frame = export["start"], export["end"]
+        sink = export["sink"]
+        events = autoplay_events(notes_by_track, set(KEY_TO_TRACK.values())) if judging else []
+        ev_i = 0
+        held_tracks = set()
+        beam_until = {}
+
+        def autoplay_step(t):
+            nonlocal ev_i
+            while ev_i < len(events) and events[ev_i][0] <= t:
+                et, kind, tr = events[ev_i]
+                ev_i += 1
+                engine.advance(et)
+                if kind == "press":
+                    held_tracks.add(tr)
+                    engine.press(tr, et)
+                else:
+                    held_tracks.discard(tr)
+                    beam_until[tr] = et + AUTOPLAY_BEAM_S
+                    engine.release(tr, et)
+            pressed_tracks.clear()
+            pressed_tracks.update(held_tracks)
+            pressed_tracks.update(tr for tr, until in beam_until.items() if t < until)
+
+        # 구간 시작 전까지는 그리지 않고 판정 상태만 진행 (고정 스텝이라 구간 나눔과 무관)
+        for frame in range(0 if judging else start_frame, end_frame):
+            t = frame / fps
+            if judging:
+                autoplay_step(t)
+                engine.advance(t)
+            if frame >= start_frame:
+                render(t)
+                sink(frame, screen)
+        pygame.quit()
+        return
+
+    # ---------------- 채보/모드 전환 ----------------
+    def apply_chart(chart, path, new_mode):
+        """
+        파싱된 채보(notes_by_track, note_index)와 모드를 제자리에서 교체 (오디오는 그대로 재사용).
+        인덱스는 캐시에 있고 판정 플래그는 set_chart가 한 번만 되돌리므로 채보 크기와 무관
+        """
+        nonlocal notes_by_track, note_index, xml_path, chart_name, mode, lane_tracks, KEY_TO_TRACK, side_len_lanes, MISS_TRACKS, lanes, TARGET_Y, telemetry
+        changed = (os.path.abspath(path), new_mode) != (os.path.abspath(xml_path), mode)
+        notes_by_track, note_index = chart
+        load_progress["chart"] = "ready"
+        xml_path = path
+        chart_name = os.path.basename(path)
+        mode = new_mode
+        lane_tracks, KEY_TO_TRACK, side_len_lanes, MISS_TRACKS = chart_cache.mapping(mode)
+        lanes, TARGET_Y = compute_layout(SCREEN_W, SCREEN_H)
+        engine.set_chart(notes_by_track, MISS_TRACKS)
+        reset_game()
+        pygame.display.set_caption(f"Chart Viewer - {mode}키 - {chart_name}")
+        if changed and telemetry is not None:
+            # 이전 세션 파일 마무리는 스레드로 넘겨서 전환이 프레임을 잡아먹지 않게
+            threading.Thread(target=telemetry.close, daemon=True).start()
+            telemetry = open_session_telemetry(chart_name, mode, input_offset_ms)
+
+    def request_chart(path, new_mode):
+        """캐시에 있으면 즉시 교체, 없으면 백그라운드 로딩 후 교체"""
+        nonlocal chart_future, pending_chart
+        cached = chart_cache.get(path, check_mtime=False)
+        if cached is not None:
+            apply_chart(cached, path, new_mode)
+            # 파일이 바뀌었는지(stat)는 로더에서 확인: 바뀌었으면 항목을 버려서 다음 전환 때 다시 파싱
+            loader.submit(chart_cache.get, path)
+            return
+        load_progress["chart"] = "queued"
+        chart_future = loader.submit(chart_cache.load, path, load_progress)
+        pending_chart = (path, new_mode)
+
+    def step_chart(delta):
+        # 폴더 목록은 시작할 때 로더에서 한 번만 읽는다 (아직이면 무시)
+        if not siblings:
+            return
+        cur = os.path.abspath(xml_path)
+        # 파싱에 실패한 채보는 건너뛴다 (안 그러면 같은 방향으로 더 넘어갈 수 없음)
+        charts = [c for c in siblings if c == cur or not chart_cache.failed(c)]
+        i = charts.index(cur) if cur in charts else 0
+        request_chart(charts[(i + delta) % len(charts)], mode)
+
+    def step_mode():
+        request_chart(xml_path, MODES[(MODES.index(mode) + 1) % len(MODES)] if mode in MODES else MODES[0])
+
     # ---------------- 메인 루프 ----------------
     running = True
+    siblings = None          # 같은 폴더의 채보 목록 (로더에서 한 번 읽음)
+    siblings_future = None
     note_speed_px = note_speed_mm * PIXELS_PER_MM
 
+    # 렌더링은 frame_cap으로 페이싱, 자동 miss는 engine.advance의 고정 스텝으로 분리.
+    # 키 입력 시각은 input_seconds 참고 (pygame 2.x에서는 렌더링 주기로 샘플링)
+    cap = frame_cap(vsync_hz)
+    last_frame_t = now_seconds()
+
     while running:
-        dt = clock.tick(FPS) / 1000.0
+        # tick은 남은 시간을 잠들어서 기다린다 (tick_busy_loop처럼 코어를 돌리지 않음)
+        dt = clock.tick(cap) / 1000.0
+
+        # 백그라운드 로딩 결과 반영
+        if chart_future is not None and chart_future.done():
+            try:
+                chart = chart_future.result()
+            except Exception as e:
+                # 깨진 채보 하나로 세션을 죽이지 않는다: 지금 채보를 유지하고 HUD에 표시
+                print("채보 로드 실패:", pending_chart[0], e)
+                load_progress["chart"] = f"failed: {os.path.basename(pending_chart[0])}"
+                chart = None
+            if chart is not None:
+                apply_chart(chart, *pending_chart)
+            chart_future = None
+            pending_chart = None
+            if siblings is None and siblings_future is None:
+                siblings_future = loader.submit(sibling_charts, xml_path)
+        if siblings_future is not None and siblings_future.done():
+            # 같은 폴더의 다른 난이도는 미리 파싱해 둔다
+            siblings = siblings_future.result()
+            siblings_future = None
+            chart_cache.preload(siblings)
+        if audio_future is not None and audio_future.done():
+            audio_loaded = audio_future.result()
+            audio_future = None
+        if offset_future is not None and offset_future.done():
+            input_offset_ms = offset_future.result()
+            offset_future = None
+            telemetry = open_session_telemetry(chart_name, mode, input_offset_ms)
+        if skin_future is not None and skin_future.done():
+            note_skin = skin_future.result()
+            skin_future = None
+            atlas_key = None  # 다음 프레임에 스킨으로 아틀라스를 다시 만든다
+        if load_progress["settings"] != "ready" and offset_future is None and skin_future is None:
+            load_progress["settings"] = "ready"
+        loading = chart_future is not None or audio_future is not None or offset_future is not None or skin_future is not None
 
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
                 running = False
-            elif ev.type == pygame.VIDEORESIZE:
+            elif ev.type == pygame.VIDEORESIZE and not vsync_active:
+                # vsync(SCALED) 창은 SDL이 논리 해상도를 그대로 스케일링
                 SCREEN_W, SCREEN_H = ev.w, ev.h
                 screen = pygame.display.set_mode((SCREEN_W, SCREEN_H), pygame.RESIZABLE)
                 lanes, TARGET_Y = compute_layout(SCREEN_W, SCREEN_H)
             elif ev.type == pygame.KEYDOWN:
                 if ev.key == pygame.K_ESCAPE:
                     running = False
-                elif ev.key == pygame.K_p:
+                elif ev.key == pygame.K_p and not loading:
                     # start/resume/pause handling: start only when pressing p the first time
                     if paused:
                         if start_time == 0.0:
                             # fresh start
                             start_time = time.time()
                             pause_time = 0.0
-                            if audio_loaded:
-                                try:
-                                    pygame.mixer.music.play()
-                                except:
-                                    pass
+                            audio_play()
                         else:
                             # resume from pause
                             start_time = time.time() - pause_time
-                            if audio_loaded:
-                                try:
-                                    pygame.mixer.music.unpause()
-                                except:
-                                    pass
+                            audio_unpause()
+                            if telemetry is not None:
+                                telemetry.record(TEL_RESUME, combo=engine.combo, press_s=now_seconds())
                         paused = False
                     else:
-                        # pause
-                        pause_time = now_seconds()
+                        # pause (원시 시계 기준으로 저장 -> 재개 시 오프셋 중복 없음)
+                        pause_time = clock_seconds()
                         paused = True
-                        if audio_loaded:
-                            try:
-                                pygame.mixer.music.pause()
-                            except:
-                                pass
+                        audio_pause()
+                        if telemetry is not None:
+                            telemetry.record(TEL_PAUSE, combo=engine.combo, press_s=now_seconds())
+                elif ev.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET) and chart_cache is not None and not loading:
+                    step_chart(-1 if ev.key == pygame.K_LEFTBRACKET else 1)
+                elif ev.key == pygame.K_m and chart_cache is not None and not loading:
+                    step_mode()
                 elif ev.key == pygame.K_9:
+                    if telemetry is not None:
+                        telemetry.record(TEL_RESTART, combo=engine.combo, press_s=now_seconds())
                     reset_game()
                 elif ev.key == pygame.K_2:
                     note_speed_mm += SPEED_STEP_MM
@@ -597,20 +1851,9 @@ def run_viewer(xml_path, mode):
                     tr = KEY_TO_TRACK[ev.key]
                     pressed_physical_keys.add(ev.key)
                     pressed_tracks.add(tr)
-                    t = now_seconds()
-                    # First, try to find matching hold note to start holding.
-                    started_hold = False
-                    for n in notes_by_track.get(tr, []):
-                        if n["hold"] and not n["hit"] and not n["missed"] and not n["holding"]:
-                            # allow leeway: within MISS_THRESHOLD_MS before/after start
-                            if abs(time_error_ms(n, t)) <= MISS_THRESHOLD_MS:
-                                n["holding"] = True
-                                started_hold = True
-                                # mark as not yet hit - final judgement done on release or end
-                                break
-                    if not started_hold:
-                        # judge instantaneous note
-                        do_judge(tr, t)
+                    t_in = input_seconds(ev)
+                    engine.advance(t_in)
+                    engine.press(tr, t_in)
 
             elif ev.type == pygame.KEYUP:
                 if ev.key in KEY_TO_TRACK:
@@ -618,63 +1861,36 @@ def run_viewer(xml_path, mode):
                     pressed_physical_keys.discard(ev.key)
                     if tr in pressed_tracks:
                         pressed_tracks.discard(tr)
-                    t = now_seconds()
-                    # evaluate hold release
-                    for n in notes_by_track.get(tr, []):
-                        if n["hold"] and n.get("holding", False) and not n["hit"] and not n["missed"]:
-                            # if released within 0.5s before end => success (Perfect)
-                            # i.e., if end - t <= 0.5 -> Perfect
-                            if n["e"] - t <= 0.5:
-                                judgement_counts["Perfect"] += 1
-                                apply_judgement("Perfect")
-                                n["hit"] = True
-                                n["held_success"] = True
-                                n["holding"] = False
-                            else:
-                                # too early release -> Miss (추가)
-                                judgement_counts["Miss"] += 1
-                                apply_judgement("Miss")
-                                n["missed"] = True
-                                n["holding"] = False
-                            break
-
-        # time, update
+                    t_in = input_seconds(ev)
+                    engine.advance(t_in)
+                    engine.release(tr, t_in)
+
+        # time, update: 시뮬레이션은 마지막 고정 스텝까지, 노트 위치는 현재 시각으로 보간
         t = now_seconds()
+        last_frame_t = t
         note_speed_px = note_speed_mm * PIXELS_PER_MM
-        auto_miss_check(t)
-
-        # draw
-        screen.fill(BG)
-        # lanes background
-        for x, w in lanes:
-            pygame.draw.rect(screen, LANE_BG, (x, 0, w, SCREEN_H))
-            pygame.draw.line(screen, GRAY, (x, 0), (x, SCREEN_H), 1)
-
-        # draw notes
-        draw_notes(t)
-
-        # draw keybeams under/above judge line
-        draw_keybeams()
-
-        # judge line always on top: thick green
-        x1 = lanes[0][0] - 4
-        x2 = lanes[-1][0] + lanes[-1][1] + 4
-        pygame.draw.line(screen, GREEN, (x1, TARGET_Y), (x2, TARGET_Y), JUDGE_LINE_THICKNESS_PX)
-
-        # lane labels and HUD
-        draw_lane_labels()
-        draw_hud(t)
+        engine.advance(t)
+        check_calibration_done(t)
 
+        render(t)
+        if loading:
+            draw_loading()
         pygame.display.flip()
 
+    if loader is not None:
+        loader.shutdown()
+    if chart_cache is not None:
+        chart_cache.shutdown()
+    if telemetry is not None:
+        telemetry.close()
     pygame.quit()
 
 # ---------------- 엔트리 ----------------
 if __name__ == "__main__":
-    mode, xml_file = choose_mode_and_file()
-    if not mode or not xml_file:
+    mode, xml_file, calibrate = choose_mode_and_file()
+    if not mode or not (xml_file or calibrate):
         print("모드 선택 또는 파일 선택이 취소되었습니다.")
         sys.exit(0)
     # pre-build mapping to check
     lane_tracks_tmp, key_to_track_tmp, side_len_lanes_tmp, MISS_TRACKS_tmp = build_mode_mapping(mode)
-    run_viewer(xml_file, mode)
\ No newline at end of file
+    run_viewer(xml_file, mode, calibrate=calibrate)
\ No newline at end of file